@@ -1,10 +1,138 @@
 import json
 import heapq
+import itertools
+import functools
 import os
-import glob
-from typing import List, Tuple, Dict, Any
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple, Dict, Any, Iterable, Iterator
 
-def find_longest_correct_proofs_directory(directory_path: str, top_k: int = 3) -> List[Dict[str, Any]]:
+from utils.io import loads_json, write_json
+
+# A theorem together with its longest correct proof. All records from one
+# result file share a single experiment_setting dict, so treat it as read-only.
+TheoremInfo = namedtuple(
+    'TheoremInfo',
+    'theorem_name theorem_statement proof proof_length proof_info source_file experiment_setting'
+)
+
+def iter_result_records(file_path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the top-level JSON objects stored in a result file.
+    
+    Result files are either a single (possibly indented) JSON document or
+    true JSONL with one object per line. JSONL files are parsed one line at a
+    time so that the whole file is never held in memory.
+    
+    Args:
+        file_path: Path to the result file
+    
+    Yields:
+        Parsed JSON objects in file order
+    """
+    with open(file_path, 'rb') as file:
+        first_line = file.readline()
+        try:
+            first_record = loads_json(first_line)
+        except ValueError:
+            # The first line is not a complete document, so parse the whole file at once
+            yield loads_json(first_line + file.read())
+            return
+        
+        yield first_record
+        for line in file:
+            if line.strip():
+                yield loads_json(line)
+
+def iter_correct_proofs(records: Iterable[Dict[str, Any]]) -> Iterator[Tuple[str, Dict[str, Any], Dict[str, Any], Dict[str, Any]]]:
+    """
+    Yield the longest correct proof of every theorem in a result file that has one.
+    
+    Only references into the parsed records are yielded; building the
+    TheoremInfo record is left to the caller once the theorem is selected.
+    
+    Args:
+        records: Top-level JSON objects of an experiment result file
+    
+    Yields:
+        Tuples of (theorem name, theorem data, longest correct candidate, experiment setting)
+    """
+    
+    experiment_setting = {}
+    
+    for record in records:
+        # Looked up once per record and shared by every theorem it contains
+        experiment_setting = record.get('experiment_setting', experiment_setting)
+        
+        # Extract results for each theorem
+        results = record.get('results', {})
+        
+        for theorem_name, theorem_data in results.items():
+            candidates = theorem_data.get('candidates', [])
+            
+            # Find the longest correct proof for this theorem
+            best = max(
+                (c for c in candidates if c.get('is_correct', False)),
+                key=lambda c: len(c.get('proof', '')),
+                default=None
+            )
+            
+            # Only consider theorems that have at least one non-empty correct proof
+            if best is not None and best.get('proof', ''):
+                yield theorem_name, theorem_data, best, experiment_setting
+
+def select_top_theorems(records: Iterable[Dict[str, Any]], source_file: str, top_k: int) -> List[TheoremInfo]:
+    """
+    Select the top k theorems with the longest correct proofs from a result file.
+    
+    Args:
+        records: Top-level JSON objects of an experiment result file
+        source_file: Name of the file the records were loaded from
+        top_k: Number of top theorems to return
+    
+    Returns:
+        List of TheoremInfo records, sorted by proof length (descending)
+    """
+    selected = heapq.nlargest(
+        top_k,
+        iter_correct_proofs(records),
+        key=lambda entry: len(entry[2].get('proof', ''))
+    )
+    
+    # TheoremInfo is only built for the selected theorems
+    top_theorems = []
+    for theorem_name, theorem_data, best, experiment_setting in selected:
+        proof = best.get('proof', '')
+        top_theorems.append(TheoremInfo(
+            theorem_name=theorem_name,
+            theorem_statement=theorem_data.get('theoremStatement', ''),
+            proof=proof,
+            proof_length=len(proof),
+            proof_info=best,
+            source_file=source_file,
+            experiment_setting=experiment_setting
+        ))
+    return top_theorems
+
+def _process_file(file_path: str, source_file: str, top_k: int) -> List[TheoremInfo]:
+    """
+    Find the top k theorems with the longest correct proofs in one result file.
+    
+    Errors are reported and yield an empty list so that one bad file does not
+    abort the whole directory scan.
+    """
+    print(f"Processing {source_file}...")
+    
+    try:
+        return select_top_theorems(iter_result_records(file_path), source_file, top_k)
+    
+    except json.JSONDecodeError as e:
+        print(f"  Warning: Error reading {source_file}: {e}")
+    except Exception as e:
+        print(f"  Warning: Error processing {source_file}: {e}")
+    return []
+
+def find_longest_correct_proofs_directory(directory_path: str, top_k: int = 3) -> List[TheoremInfo]:
     """
     Find the theorems with the longest correct proofs across all JSONL files in a directory.
     
@@ -13,93 +141,39 @@ def find_longest_correct_proofs_directory(directory_path: str, top_k: int = 3) -
         top_k: Number of top theorems to return (default: 3)
     
     Returns:
-        List of dictionaries containing theorem info and longest correct proof
+        List of TheoremInfo records, sorted by proof length (descending)
     """
     
-    # Use a min-heap to keep track of top k longest proofs across all files
-    min_heap = []
-    
-    # Find all JSONL files in the directory
-    jsonl_files = glob.glob(os.path.join(directory_path, "*.jsonl"))
+    # Find all JSONL files in the directory (hidden files are skipped, as glob does)
+    with os.scandir(directory_path) as entries:
+        jsonl_files = [
+            (entry.path, entry.name) for entry in entries
+            if entry.name.endswith(".jsonl") and not entry.name.startswith(".") and entry.is_file()
+        ]
     
     if not jsonl_files:
         print(f"No JSONL files found in directory: {directory_path}")
         return []
     
     print(f"Found {len(jsonl_files)} JSONL files to analyze:")
-    for file_path in jsonl_files:
-        print(f"  - {os.path.basename(file_path)}")
+    for _, file_name in jsonl_files:
+        print(f"  - {file_name}")
     print()
     
-    # Process each JSONL file
-    for file_path in jsonl_files:
-        print(f"Processing {os.path.basename(file_path)}...")
-        
-        try:
-            with open(file_path, 'r') as file:
-                data = json.load(file)
-                
-                # Extract results for each theorem
-                results = data.get('results', {})
-                
-                for theorem_name, theorem_data in results.items():
-                    theorem_statement = theorem_data.get('theoremStatement', '')
-                    candidates = theorem_data.get('candidates', [])
-                    
-                    # Find the longest correct proof for this theorem
-                    longest_correct_proof = ""
-                    longest_proof_length = 0
-                    longest_proof_info = None
-                    
-                    for candidate in candidates:
-                        if candidate.get('is_correct', False):
-                            proof = candidate.get('proof', '')
-                            proof_length = len(proof)
-                            
-                            if proof_length > longest_proof_length:
-                                longest_proof_length = proof_length
-                                longest_correct_proof = proof
-                                longest_proof_info = candidate
-                    
-                    # Only consider theorems that have at least one correct proof
-                    if longest_proof_length > 0:
-                        theorem_info = {
-                            'theorem_name': theorem_name,
-                            'theorem_statement': theorem_statement,
-                            'proof': longest_correct_proof,
-                            'proof_length': longest_proof_length,
-                            'proof_info': longest_proof_info,
-                            'source_file': os.path.basename(file_path)
-                        }
-                        
-                        # Append experiment settings to theorem info
-                        theorem_info['experiment_setting'] = data.get('experiment_setting', {})
-                        
-                        # Use min-heap to maintain top k longest proofs
-                        if len(min_heap) < top_k:
-                            heapq.heappush(min_heap, (longest_proof_length, theorem_name, theorem_info))
-                        elif longest_proof_length > min_heap[0][0]:
-                            heapq.heapreplace(min_heap, (longest_proof_length, theorem_name, theorem_info))
-                
-                 # combine theorem info in the topwith settings         
-                        
-        
-        except json.JSONDecodeError as e:
-            print(f"  Warning: Error reading {os.path.basename(file_path)}: {e}")
-            continue
-        except Exception as e:
-            print(f"  Warning: Error processing {os.path.basename(file_path)}: {e}")
-            continue
-    
-    # Extract theorems from heap and sort by length (descending)
-    top_theorems = [theorem_info for _, _, theorem_info in min_heap]
-    top_theorems.sort(key=lambda x: x['proof_length'], reverse=True)
+    file_paths, file_names = zip(*jsonl_files)
     
-    # For each theorem info in top_theorems, add the experiment settings
+    # Each file computes its own top k in a worker process; merge the partial results
+    with ProcessPoolExecutor() as executor:
+        partials = executor.map(functools.partial(_process_file, top_k=top_k), file_paths, file_names)
+        top_theorems = heapq.nlargest(
+            top_k,
+            itertools.chain.from_iterable(partials),
+            key=lambda t: t.proof_length
+        )
     
     return top_theorems
 
-def find_longest_correct_proofs_single_file(jsonl_file_path: str, top_k: int = 3) -> List[Dict[str, Any]]:
+def find_longest_correct_proofs_single_file(jsonl_file_path: str, top_k: int = 3) -> List[TheoremInfo]:
     """
     Find the theorems with the longest correct proofs in a single JSONL file.
     
@@ -108,70 +182,17 @@ def find_longest_correct_proofs_single_file(jsonl_file_path: str, top_k: int = 3
         top_k: Number of top theorems to return (default: 3)
     
     Returns:
-        List of dictionaries containing theorem info and longest correct proof
+        List of TheoremInfo records, sorted by proof length (descending)
     """
     
-    # Use a min-heap to keep track of top k longest proofs
-    min_heap = []
-    
-    with open(jsonl_file_path, 'r') as file:
-        data = json.loads(file)
-        settings = data['experiment_setting']
-        
-        # Extract results for each theorem
-        results = data.get('results', {})
-        
-        for theorem_name, theorem_data in results.items():
-            theorem_statement = theorem_data.get('theoremStatement', '')
-            candidates = theorem_data.get('candidates', [])
-            
-            # Find the longest correct proof for this theorem
-            longest_correct_proof = ""
-            longest_proof_length = 0
-            longest_proof_info = None
-            
-            for candidate in candidates:
-                if candidate.get('is_correct', False):
-                    proof = candidate.get('proof', '')
-                    proof_length = len(proof)
-                    
-                    if proof_length > longest_proof_length:
-                        longest_proof_length = proof_length
-                        longest_correct_proof = proof
-                        longest_proof_info = candidate
-            
-            # Only consider theorems that have at least one correct proof
-            if longest_proof_length > 0:
-                theorem_info = {
-                    'theorem_name': theorem_name,
-                    'theorem_statement': theorem_statement,
-                    'proof': longest_correct_proof,
-                    'proof_length': longest_proof_length,
-                    'proof_info': longest_proof_info,
-                    'source_file': os.path.basename(jsonl_file_path)
-                }
-                
-                
-                
-                # Use min-heap to maintain top k longest proofs
-                if len(min_heap) < top_k:
-                    heapq.heappush(min_heap, (longest_proof_length, theorem_name, theorem_info))
-                elif longest_proof_length > min_heap[0][0]:
-                    heapq.heapreplace(min_heap, (longest_proof_length, theorem_name, theorem_info))
-    
-    # Extract theorems from heap and sort by length (descending)
-    top_theorems = [theorem_info for _, _, theorem_info in min_heap]
-    top_theorems.sort(key=lambda x: x['proof_length'], reverse=True)
-    
-    
-    return top_theorems
+    return select_top_theorems(iter_result_records(jsonl_file_path), os.path.basename(jsonl_file_path), top_k)
 
-def save_results(theorems: List[Dict[str, Any]], output_file: str = 'longest_correct_proofs.json'):
+def save_results(theorems: List[TheoremInfo], output_file: str = 'longest_correct_proofs.json'):
     """
     Save the results to a JSON file.
     
     Args:
-        theorems: List of theorem dictionaries
+        theorems: List of TheoremInfo records
         output_file: Output file path
     """
     
@@ -180,25 +201,24 @@ def save_results(theorems: List[Dict[str, Any]], output_file: str = 'longest_cor
     for i, theorem in enumerate(theorems, 1):
         save_data.append({
             'rank': i,
-            'theorem_name': theorem['theorem_name'],
-            'theorem_statement': theorem['theorem_statement'],
-            'proof': theorem['proof'],
-            'proof_length': theorem['proof_length'],
-            'source_file': theorem.get('source_file', 'unknown'),
-            'experiment_setting': theorem.get('experiment_setting', {})
+            'theorem_name': theorem.theorem_name,
+            'theorem_statement': theorem.theorem_statement,
+            'proof': theorem.proof,
+            'proof_length': theorem.proof_length,
+            'source_file': theorem.source_file,
+            'experiment_setting': theorem.experiment_setting
         })
     
-    with open(output_file, 'w') as f:
-        json.dump(save_data, f, indent=2)
+    write_json(save_data, output_file)
     
     print(f"Results saved to {output_file}")
 
-def print_results(theorems: List[Dict[str, Any]]):
+def print_results(theorems: List[TheoremInfo]):
     """
     Print the results in a readable format.
     
     Args:
-        theorems: List of theorem dictionaries
+        theorems: List of TheoremInfo records
     """
     
     print("=" * 80)
@@ -206,16 +226,14 @@ def print_results(theorems: List[Dict[str, Any]]):
     print("=" * 80)
     
     for i, theorem in enumerate(theorems, 1):
-        print(f"\n{i}. THEOREM: {theorem['theorem_name']}")
-        print(f"   SOURCE FILE: {theorem.get('source_file', 'unknown')}")
-        print(f"   PROOF LENGTH: {theorem['proof_length']} characters")
-        print(f"   STATEMENT: {theorem['theorem_statement']}")
+        print(f"\n{i}. THEOREM: {theorem.theorem_name}")
+        print(f"   SOURCE FILE: {theorem.source_file}")
+        print(f"   PROOF LENGTH: {theorem.proof_length} characters")
+        print(f"   STATEMENT: {theorem.theorem_statement}")
         print(f"   PROOF:")
         print(f"   {'-' * 60}")
-        # Print proof with proper indentation
-        proof_lines = theorem['proof'].split('\n')
-        for line in proof_lines:
-            print(f"   {line}")
+        # Print proof with proper indentation in a single write
+        print('\n'.join('   ' + line for line in theorem.proof.split('\n')))
         print(f"   {'-' * 60}")
 
 def main():
@@ -1,13 +1,27 @@
-import json
+import csv
+import math
 import os
-import pandas as pd
 from pathlib import Path
-import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from statistics import fmean
+
+from utils.io import read_json
 
 def load_jsonl_file(filepath):
     """Load a single JSONL file and return the parsed data."""
-    with open(filepath, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return read_json(filepath)
+
+# Candidate fields averaged per statement, mapped to their metric names
+METRIC_FIELDS = {
+    'duration': 'avg_duration',
+    'prompt_tokens': 'avg_prompt_tokens',
+    'completion_tokens': 'avg_completion_tokens',
+    'total_tokens': 'avg_total_tokens',
+}
+
+def mean_or_nan(values):
+    """Return the mean of a list of numbers, or NaN if it is empty."""
+    return fmean(values) if values else float('nan')
 
 def calculate_statement_metrics(statement_data):
     """Calculate metrics for a single theorem statement."""
@@ -16,41 +30,35 @@ def calculate_statement_metrics(statement_data):
     if not candidates:
         return None
     
-    # Extract metrics from all candidates
-    durations = []
-    prompt_tokens = []
-    completion_tokens = []
-    total_tokens = []
-    compiled_lines = []
+    # Accumulate sums and counts in a single pass over the candidates
+    sums = dict.fromkeys(METRIC_FIELDS, 0.0)
+    counts = dict.fromkeys(METRIC_FIELDS, 0)
+    n_compiled_lines = 0
+    n_compiled = 0
     
     for candidate in candidates:
-        if 'duration' in candidate:
-            durations.append(candidate['duration'])
-        if 'prompt_tokens' in candidate:
-            prompt_tokens.append(candidate['prompt_tokens'])
-        if 'completion_tokens' in candidate:
-            completion_tokens.append(candidate['completion_tokens'])
-        if 'total_tokens' in candidate:
-            total_tokens.append(candidate['total_tokens'])
+        for field in METRIC_FIELDS:
+            value = candidate.get(field)
+            if value is not None:
+                sums[field] += value
+                counts[field] += 1
+        # A null compiled_lines still counts as a candidate that did not compile
         if 'compiled_lines' in candidate:
-            compiled_lines.append(candidate['compiled_lines'])
+            n_compiled_lines += 1
+            lines = candidate['compiled_lines']
+            if lines and lines > 0:
+                n_compiled += 1
     
     # Calculate averages for this statement
     statement_metrics = {}
     
-    if durations:
-        statement_metrics['avg_duration'] = np.mean(durations)
-    if prompt_tokens:
-        statement_metrics['avg_prompt_tokens'] = np.mean(prompt_tokens)
-    if completion_tokens:
-        statement_metrics['avg_completion_tokens'] = np.mean(completion_tokens)
-    if total_tokens:
-        statement_metrics['avg_total_tokens'] = np.mean(total_tokens)
+    for field, metric_name in METRIC_FIELDS.items():
+        if counts[field]:
+            statement_metrics[metric_name] = sums[field] / counts[field]
     
     # Calculate compiled ratio (compiled_lines > 0 means successful compilation)
-    if compiled_lines:
-        compiled_ratio = sum(1 for lines in compiled_lines if lines and lines > 0) / len(compiled_lines)
-        statement_metrics['compiled_ratio'] = compiled_ratio
+    if n_compiled_lines:
+        statement_metrics['compiled_ratio'] = n_compiled / n_compiled_lines
     
     return statement_metrics
 
@@ -77,11 +85,11 @@ def process_jsonl_file(filepath):
     # Calculate overall averages across all statements
     overall_metrics = {
         'used_hints': used_hints,
-        'avg_duration': np.mean([m['avg_duration'] for m in statement_metrics_list if 'avg_duration' in m]),
-        'avg_prompt_tokens': np.mean([m['avg_prompt_tokens'] for m in statement_metrics_list if 'avg_prompt_tokens' in m]),
-        'avg_completion_tokens': np.mean([m['avg_completion_tokens'] for m in statement_metrics_list if 'avg_completion_tokens' in m]),
-        'avg_total_tokens': np.mean([m['avg_total_tokens'] for m in statement_metrics_list if 'avg_total_tokens' in m]),
-        'avg_compiled_ratio': np.mean([m['compiled_ratio'] for m in statement_metrics_list if 'compiled_ratio' in m])
+        'avg_duration': mean_or_nan([m['avg_duration'] for m in statement_metrics_list if 'avg_duration' in m]),
+        'avg_prompt_tokens': mean_or_nan([m['avg_prompt_tokens'] for m in statement_metrics_list if 'avg_prompt_tokens' in m]),
+        'avg_completion_tokens': mean_or_nan([m['avg_completion_tokens'] for m in statement_metrics_list if 'avg_completion_tokens' in m]),
+        'avg_total_tokens': mean_or_nan([m['avg_total_tokens'] for m in statement_metrics_list if 'avg_total_tokens' in m]),
+        'avg_compiled_ratio': mean_or_nan([m['compiled_ratio'] for m in statement_metrics_list if 'compiled_ratio' in m])
     }
     
     return overall_metrics
@@ -103,24 +111,25 @@ def analyze_directory(directory_path, output_csv_path):
     
     print(f"Found {len(jsonl_files)} .jsonl files to process...")
     
-    for filepath in jsonl_files:
-        print(f"Processing: {filepath.name}")
-        try:
-            metrics = process_jsonl_file(filepath)
-            if metrics:
-                all_results.append(metrics)
-                print(f"  ✓ Processed successfully (used_hints: {metrics['used_hints']})")
-            else:
-                print(f"  ⚠ No valid data found in {filepath.name}")
-        except Exception as e:
-            print(f"  ✗ Error processing {filepath.name}: {e}")
+    # Files are independent, so process them in parallel and report in order
+    with ProcessPoolExecutor() as executor:
+        futures = [executor.submit(process_jsonl_file, filepath) for filepath in jsonl_files]
+        
+        for filepath, future in zip(jsonl_files, futures):
+            print(f"Processing: {filepath.name}")
+            try:
+                metrics = future.result()
+                if metrics:
+                    all_results.append(metrics)
+                    print(f"  ✓ Processed successfully (used_hints: {metrics['used_hints']})")
+                else:
+                    print(f"  ⚠ No valid data found in {filepath.name}")
+            except Exception as e:
+                print(f"  ✗ Error processing {filepath.name}: {e}")
     
     if not all_results:
         raise ValueError("No valid results found in any of the files")
     
-    # Create DataFrame and save to CSV
-    df = pd.DataFrame(all_results)
-    
     # Reorder columns as requested
     column_order = [
         'used_hints', 
@@ -132,22 +141,34 @@ def analyze_directory(directory_path, output_csv_path):
     ]
     
     # Only include columns that exist in the data
-    available_columns = [col for col in column_order if col in df.columns]
-    df = df[available_columns]
+    available_columns = [col for col in column_order if any(col in row for row in all_results)]
+    
+    def format_value(value):
+        # Round numerical values for better readability; a NaN average is left empty, as pandas wrote it
+        if isinstance(value, float):
+            return '' if math.isnan(value) else round(value, 4)
+        return value
     
-    # Round numerical values for better readability
-    numeric_columns = df.select_dtypes(include=[np.number]).columns
-    df[numeric_columns] = df[numeric_columns].round(4)
+    rows = [
+        {col: format_value(row.get(col, '')) for col in available_columns}
+        for row in all_results
+    ]
     
     # Save to CSV
-    df.to_csv(output_csv_path, index=False)
+    with open(output_csv_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=available_columns, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(rows)
     
     print(f"\n✓ Results saved to: {output_csv_path}")
     print(f"✓ Processed {len(all_results)} files successfully")
     print("\nSummary of results:")
-    print(df.to_string(index=False))
+    widths = {col: max(len(col), *(len(str(row[col])) for row in rows)) for col in available_columns}
+    print("  ".join(col.rjust(widths[col]) for col in available_columns))
+    for row in rows:
+        print("  ".join(str(row[col]).rjust(widths[col]) for col in available_columns))
     
-    return df
+    return rows
 
 if __name__ == "__main__":
     # Configuration
@@ -155,5 +176,5 @@ if __name__ == "__main__":
     DIRECTORY_PATH = f"/Users/siyuange/Documents/lean_llm_test/results/results_by_model/{model_name}"  # Change this to your directory path
     OUTPUT_CSV_PATH = f"{model_name}.csv"
     
-    results_df = analyze_directory(DIRECTORY_PATH, OUTPUT_CSV_PATH)
+    results = analyze_directory(DIRECTORY_PATH, OUTPUT_CSV_PATH)
     print(f"\n🎉 Analysis complete! Results saved to '{OUTPUT_CSV_PATH}'")
\ No newline at end of file
@@ -1,11 +1,24 @@
-import json
 import re
 from typing import Dict, Any, List
 import os
+from collections import Counter
 
-with open('/Users/siyuange/Documents/lean_llm_test/theorem_names.json', 'r') as f:
-    data = json.load(f)
-    brute_force_theorems = set(data['theorem_names'])    
+from utils.io import read_json, write_json
+
+BRUTE_FORCE_THEOREMS = frozenset(read_json('/Users/siyuange/Documents/lean_llm_test/theorem_names.json')['theorem_names'])
+
+# Theorem name prefix -> category, checked in this order
+PREFIX_MAP = {
+    "imo": "imo",
+    "amc": "amc12",
+    "aime": "aime",
+    "mathd_numbertheory": "mathd_numbertheory",
+    "mathd_algebra": "mathd_algebra",
+    "algebra": "algebra",
+    "numbertheory": "numbertheory",
+    "induction": "induction",
+}
+PREFIX_RE = re.compile("|".join(re.escape(prefix) for prefix in PREFIX_MAP))
 
 def extract_category(theorem_name: str) -> str:
     """
@@ -14,28 +27,11 @@ def extract_category(theorem_name: str) -> str:
     - amc12_* -> "amc12"  
     - others -> everything before first numeric part
     """
-    if theorem_name.startswith("imo"):
-        return "imo"
-    elif theorem_name.startswith("amc"):
-        return "amc12"
-    elif theorem_name.startswith("aime"):
-        return "aime"
-    elif theorem_name.startswith("mathd_numbertheory"):
-        return "mathd_numbertheory"
-    elif theorem_name.startswith("mathd_algebra"):
-        return "mathd_algebra"
-    elif theorem_name.startswith("algebra"):
-        return "algebra"
-    elif theorem_name.startswith("numbertheory"):
-        return "numbertheory"
-    elif theorem_name.startswith("induction"):
-        return "induction"
-    else:
+    match = PREFIX_RE.match(theorem_name)
+    if match is None:
         print(f"Warning: Unrecognized theorem name '{theorem_name}'. Defaulting to 'unknown'.")
         return "unknown"
-
-def can_solve_by_brute_force(theorem_name: str) -> bool:
-    return theorem_name in brute_force_theorems
+    return PREFIX_MAP[match.group(0)]
 
 
 def process_jsonl_file(input_file: str, output_file: str) -> None:
@@ -46,8 +42,7 @@ def process_jsonl_file(input_file: str, output_file: str) -> None:
         input_file: Path to input .jsonl file
         output_file: Path to output .jsonl file
     """
-    with open(input_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    data = read_json(input_file)
     
     # Process each theorem in the results
     if 'results' in data:
@@ -56,7 +51,7 @@ def process_jsonl_file(input_file: str, output_file: str) -> None:
             category = extract_category(theorem_name)
             
             # Check if can be solved by brute force
-            brute_force = can_solve_by_brute_force(theorem_name)
+            brute_force = theorem_name in BRUTE_FORCE_THEOREMS
             
             # Add the new fields
             theorem_data['category'] = category
@@ -65,8 +60,7 @@ def process_jsonl_file(input_file: str, output_file: str) -> None:
             print(f"Processed {theorem_name}: category='{category}', brute_force={brute_force}")
     
     # Write the updated data to output file
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    write_json(data, output_file)
     
     print(f"\nProcessing complete! Updated file saved to: {output_file}")
 
@@ -77,24 +71,17 @@ def analyze_categories(data: Dict[str, Any]) -> None:
     if 'results' not in data:
         return
     
-    category_counts = {}
-    brute_force_counts = {'True': 0, 'False': 0}
-    category_brute_force = {}
+    # Count (category, brute_force) pairs in one pass, then derive the marginals
+    category_brute_force = Counter(
+        (theorem_data.get('category', 'unknown'), str(theorem_data.get('brute_force', False)))
+        for theorem_data in data['results'].values()
+    )
     
-    for theorem_name, theorem_data in data['results'].items():
-        category = theorem_data.get('category', 'unknown')
-        brute_force = theorem_data.get('brute_force', False)
-        
-        # Count categories
-        category_counts[category] = category_counts.get(category, 0) + 1
-        
-        # Count brute force
-        brute_force_counts[str(brute_force)] += 1
-        
-        # Count brute force by category
-        if category not in category_brute_force:
-            category_brute_force[category] = {'True': 0, 'False': 0}
-        category_brute_force[category][str(brute_force)] += 1
+    category_counts = Counter()
+    brute_force_counts = Counter({'True': 0, 'False': 0})
+    for (category, brute_force), count in category_brute_force.items():
+        category_counts[category] += count
+        brute_force_counts[brute_force] += count
     
     print("\n" + "="*50)
     print("ANALYSIS SUMMARY")
@@ -113,11 +100,11 @@ def analyze_categories(data: Dict[str, Any]) -> None:
         print(f"  {bf_status}: {count} ({percentage:.1f}%)")
     
     print(f"\nBrute force by category:")
-    for category in sorted(category_brute_force.keys()):
-        bf_data = category_brute_force[category]
-        total_cat = bf_data['True'] + bf_data['False']
-        bf_pct = (bf_data['True'] / total_cat) * 100 if total_cat > 0 else 0
-        print(f"  {category}: {bf_data['True']}/{total_cat} ({bf_pct:.1f}% brute force)")
+    for category in sorted(category_counts.keys()):
+        bf_true = category_brute_force[(category, 'True')]
+        total_cat = category_counts[category]
+        bf_pct = (bf_true / total_cat) * 100 if total_cat > 0 else 0
+        print(f"  {category}: {bf_true}/{total_cat} ({bf_pct:.1f}% brute force)")
 
 def main():
     """
@@ -1,4 +1,5 @@
-from litellm import cost_per_token
+import numpy as np
+from litellm import get_model_info
 
 data = [
     (618.3238, 314.3757),
@@ -16,14 +17,13 @@ data = [
 # model_name = "deepseek-reasoner"
 model_name = "gpt-4o"
 
-for i in range(len(data)):
+# Per-token prices are constant for a model, so look them up once
+model_info = get_model_info(model=model_name)
+prompt_token_price = model_info['input_cost_per_token']
+completion_token_price = model_info['output_cost_per_token']
 
-    prompt_tokens = round(data[i][0])
-    completion_tokens = round(data[i][1])
-    prompt_tokens_cost_usd_dollar, completion_tokens_cost_usd_dollar = cost_per_token(
-      model=model_name,
-      prompt_tokens=prompt_tokens,
-      completion_tokens=completion_tokens
-    )
+tokens = np.round(np.array(data))
+costs_usd_dollar = tokens[:, 0] * prompt_token_price + tokens[:, 1] * completion_token_price
 
-    print(prompt_tokens_cost_usd_dollar + completion_tokens_cost_usd_dollar)
\ No newline at end of file
+for cost in costs_usd_dollar:
+    print(cost)
@@ -0,0 +1,34 @@
+"""
+JSON reading and writing shared by the analysis scripts.
+
+orjson is used when it is installed; otherwise the stdlib json module is used.
+"""
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads_json(raw: bytes) -> Any:
+    """Parse a JSON document from bytes."""
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
+def read_json(path) -> Any:
+    """Read and parse a whole JSON document from disk."""
+    with open(path, 'rb') as f:
+        return loads_json(f.read())
+
+
+def write_json(obj: Any, path) -> None:
+    """Write a JSON document with 2-space indentation."""
+    if orjson is not None:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(obj, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,102 @@
+import json
+import hashlib
+import os
+from types import SimpleNamespace
+from typing import Dict, Optional
+
+
+class ResponseCache:
+    """
+    Two-tier cache of model responses, persisted as JSONL under ./cache/.
+
+    Exact lookups hash every request parameter. Semantic lookups (optional) embed the
+    user prompt and return the closest cached response issued with otherwise identical
+    parameters, provided its cosine similarity clears the threshold.
+    """
+
+    def __init__(self, path: str = "cache/responses.jsonl", semantic: bool = False, threshold: float = 0.95):
+        self.path = path
+        self.threshold = threshold
+        self.records = {}
+
+        self.encoder = None
+        self.embedding_cache = {}
+        self.scopes = {}
+        if semantic:
+            import numpy as np
+            from sentence_transformers import SentenceTransformer
+            self.np = np
+            self.encoder = SentenceTransformer("all-MiniLM-L6-v2")
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._index(entry)
+
+        self.file = open(path, 'a', buffering=1)
+
+    @staticmethod
+    def make_key(params: Dict, prompt: Optional[str] = None) -> str:
+        """Hash the request parameters (and the prompt, if given) into a cache key."""
+        payload = dict(params)
+        if prompt is not None:
+            payload['prompt'] = prompt
+        return hashlib.blake2b(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    def _embed(self, prompt: str):
+        # Every candidate of a statement shares the same prompt, so embed it only once
+        if prompt not in self.embedding_cache:
+            self.embedding_cache[prompt] = self.encoder.encode(prompt, normalize_embeddings=True)
+        return self.embedding_cache[prompt]
+
+    def _index(self, entry: Dict):
+        self.records[entry['key']] = entry['record']
+        if self.encoder is not None:
+            keys, vectors = self.scopes.setdefault(entry['scope'], ([], []))
+            keys.append(entry['key'])
+            vectors.append(self._embed(entry['prompt']))
+
+    def get(self, params: Dict, prompt: str) -> Optional[Dict]:
+        """Return the cached record for this request, or None on a miss."""
+        record = self.records.get(self.make_key(params, prompt))
+        if record is not None or self.encoder is None:
+            return record
+
+        scope = self.scopes.get(self.make_key(params))
+        if scope is None:
+            return None
+        keys, vectors = scope
+        similarities = self.np.stack(vectors) @ self._embed(prompt)
+        best = int(similarities.argmax())
+        if similarities[best] >= self.threshold:
+            return self.records[keys[best]]
+        return None
+
+    def put(self, params: Dict, prompt: str, content: str, usage) -> None:
+        """Store a response and append it to the cache file."""
+        entry = {
+            'key': self.make_key(params, prompt),
+            'scope': self.make_key(params),
+            'prompt': prompt,
+            'record': {
+                'content': content,
+                'usage': {
+                    'prompt_tokens': usage.prompt_tokens,
+                    'completion_tokens': usage.completion_tokens,
+                    'total_tokens': usage.total_tokens
+                } if usage else None
+            }
+        }
+        self._index(entry)
+        self.file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+
+def as_response(record: Dict) -> SimpleNamespace:
+    """Wrap a cached record so it can be read like a litellm response."""
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=record['content']))],
+        usage=SimpleNamespace(**record['usage']) if record['usage'] else None
+    )
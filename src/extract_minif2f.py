@@ -21,46 +21,27 @@ def read_file(file_path: str) -> str:
         raise Exception(f"Error reading file {file_path}: {e}")
 
 
+# A theorem/lemma/def block at the start of a line, up to its ":= by sorry".
+# The body may not run into the next declaration, so blocks without a sorry are skipped.
+STATEMENT_RE = re.compile(
+    r"^((theorem|lemma|def)\s+([a-zA-Z_][a-zA-Z0-9_']*)(?:(?!\n(?:theorem|lemma|def)).)*?):=\s*by\s+sorry",
+    re.MULTILINE | re.DOTALL
+)
+
+
 def extract_statements(lean_content: str) -> List[Dict[str, str]]:
     """
     Alternative extraction method that handles the specific format of your Lean file.
-    This method splits on theorem boundaries and processes each complete theorem block.
+    This method scans the file once and extracts each theorem block up to its ":= by sorry".
     """
-    statements = []
-    
-    # Split content by theorem/lemma/def keywords
-    parts = re.split(r'\n(?=theorem|lemma|def)', lean_content)
-    
-    for part in parts:
-        part = part.strip()
-        if not part:
-            continue
-            
-        # Check if this part starts with theorem/lemma/def
-        match = re.match(r'^(theorem|lemma|def)\s+([a-zA-Z_][a-zA-Z0-9_\']*)', part)
-        if not match:
-            continue
-            
-        statement_type = match.group(1)
-        theorem_name = match.group(2)
-        
-        # Find the end of the statement (before := by sorry)
-        end_match = re.search(r':=\s*by\s+sorry', part)
-        if not end_match:
-            continue
-            
-        # Extract everything from the start to just before :=
-        statement_text = part[:end_match.start()].strip()
-        
-        # Clean up whitespace and newlines
-        statement_text = ' '.join(statement_text.split())
-        
-        statements.append({
-            'theoremName': theorem_name,
-            'theoremStatement': statement_text
-        })
-    
-    return statements
+    return [
+        {
+            'theoremName': match.group(3),
+            # Clean up whitespace and newlines
+            'theoremStatement': ' '.join(match.group(1).split())
+        }
+        for match in STATEMENT_RE.finditer(lean_content)
+    ]
 
 
 def create_jsonl(statements: List[Dict[str, str]], src_context: str, output_file: str):
@@ -1,7 +1,7 @@
 import json
+import re
+import functools
 import asyncio
-import multiprocessing as mp
-from multiprocessing import Pool
 import time
 import logging
 import os
@@ -10,15 +10,28 @@ from datetime import datetime
 from typing import List, Dict
 import random
 
-from tqdm import tqdm
+from tqdm.asyncio import tqdm as tqdm_asyncio
+import httpx
 import litellm
 from litellm import acompletion
 
+from cache import ResponseCache, as_response
+from json_io import load_jsonl, read_partial, write_partial
+
 load_dotenv()
 litellm.set_verbose = False
 logging.getLogger("LiteLLM").setLevel(logging.ERROR)
 logger = logging.getLogger(__name__)
 
+# Shared across all generate() calls; created lazily inside the running event loop
+_sem = None
+_cache = None
+# Requests currently awaiting a response, keyed like the response cache
+_inflight: Dict[str, asyncio.Future] = {}
+
+# Opening fence line, the body, and an optional closing fence on the last line
+_CODE_BLOCK_RE = re.compile(r"```[^\n]*\n(.*?)(?:(?:\n|(?<=\n))[^\S\n]*```[^\S\n]*)?\Z", re.DOTALL)
+
 system_prompt_w_context_template = """You are an expert Lean 4 theorem prover. Your task is to generate formal proofs in **Lean 4 syntax** given a formalized mathematical statement and its code context.
 
 ### Guidelines:
@@ -77,24 +90,14 @@ Based on the provided context, generate a whole formalized proof that complete t
 """
 
 
-def load_dataset(dataset_path):
-    tasks = []
-    with open(dataset_path) as f:
-        for line in f.readlines():
-            task = json.loads(line)
-            tasks.append(task)
-    return tasks
-
-
 def extract_proof_from_response(response: str) -> str:
         """Extract the proof from the model's response."""
         proof = response
         
         # Remove common markdown code block markers
-        if proof.startswith("```"):
-            lines = proof.split('\n')
-            if len(lines) > 1:
-                proof = '\n'.join(lines[1:-1]) if lines[-1].strip() == "```" else '\n'.join(lines[1:])
+        match = _CODE_BLOCK_RE.match(proof)
+        if match:
+            proof = match.group(1)
         
         # Remove ":=" prefix if present
         if proof.startswith(":= "):
@@ -103,53 +106,219 @@ def extract_proof_from_response(response: str) -> str:
         return proof
       
       
-async def timed_completion(system_prompt, prompt, gen_config):
+async def _request_completion(system_prompt, prompt, gen_config, **kwargs):
     model = gen_config['model']
     temperature = gen_config['temperature']
     max_tokens = gen_config['max_tokens']
     timeout = gen_config['timeout']
     reasoning_effort = gen_config['reasoning_effort']
+    max_retries = gen_config.get('max_retries', 3)
+    
+    for attempt in range(max_retries + 1):
+        async with _get_request_semaphore(gen_config):
+            start_time = time.time()
+            try:
+                if reasoning_effort == "None":
+                    response = await acompletion(
+                        model=model,
+                        messages=[
+                            {"role": "system", "content": system_prompt},
+                            {"role": "user", "content": prompt}
+                        ],
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        timeout=timeout,
+                        drop_params=True,
+                        **kwargs
+                    )
+                else:
+                    response = await acompletion(
+                        model=model,
+                        messages=[
+                            {"role": "system", "content": system_prompt},
+                            {"role": "user", "content": prompt}
+                        ],
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        timeout=timeout,
+                        reasoning_effort=reasoning_effort,
+                        drop_params=True,
+                        **kwargs
+                    )
+                end_time = time.time()
+                return {
+                    'response': response,
+                    'duration': end_time - start_time,
+                    'success': True
+                }
+            except Exception as e:
+                end_time = time.time()
+                error = e
+        
+        # The semaphore is released while backing off so other requests can proceed
+        delay = _retry_delay(error, attempt)
+        if delay is None or attempt == max_retries:
+            return {
+                'response': error,
+                'duration': end_time - start_time,
+                'success': False
+            }
+        logger.warning(f"Retrying in {delay:.1f}s after error (attempt {attempt + 1}/{max_retries}): {error}")
+        await asyncio.sleep(delay)
+
+
+def _retry_delay(error: Exception, attempt: int):
+    """Seconds to wait before retrying a failed request, or None if the error is not transient."""
+    status_code = getattr(error, 'status_code', None)
+    if not isinstance(error, litellm.RateLimitError) and not (isinstance(status_code, int) and status_code >= 500):
+        return None
+    
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    retry_after = headers.get('Retry-After') if headers is not None else None
+    if retry_after is not None:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return min(2 ** attempt + random.random(), 30)
+
+
+async def timed_completion(system_prompt, prompt, gen_config, sample_idx=0):
+    request_params = {
+        'model': gen_config['model'],
+        'temperature': gen_config['temperature'],
+        'max_tokens': gen_config['max_tokens'],
+        'reasoning_effort': gen_config['reasoning_effort'],
+        'system_prompt': system_prompt,
+        'sample_idx': sample_idx
+    }
+    
+    cache = _get_response_cache(gen_config)
+    if cache is not None:
+        record = cache.get(request_params, prompt)
+        if record is not None:
+            return {
+                'response': as_response(record),
+                'duration': 0,
+                'success': True
+            }
     
-    start_time = time.time()
+    if gen_config['temperature'] == 0 or gen_config.get('coalesce', False):
+        # At temperature 0 every sample is the same request, so they all share one key;
+        # otherwise the sample index keeps distinct samples apart and only true duplicates merge
+        key_params = dict(request_params)
+        if gen_config['temperature'] == 0:
+            del key_params['sample_idx']
+        key = ResponseCache.make_key(key_params, prompt)
+        
+        future = _inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(_request_completion(system_prompt, prompt, gen_config))
+            _inflight[key] = future
+            future.add_done_callback(lambda _: _inflight.pop(key, None))
+        result = await asyncio.shield(future)
+    else:
+        result = await _request_completion(system_prompt, prompt, gen_config)
+    
+    if cache is not None and result['success'] and result['response'].choices[0].message.content is not None:
+        cache.put(request_params, prompt, result['response'].choices[0].message.content, result['response'].usage)
+    return result
+
+
+def _get_request_semaphore(gen_config: dict) -> asyncio.Semaphore:
+    """Return the semaphore shared by every completion request, creating it on first use."""
+    global _sem
+    if _sem is None:
+        _sem = asyncio.Semaphore(gen_config.get('max_concurrent_requests', gen_config.get('batch_size', 3)))
+    return _sem
+
+
+def _get_response_cache(gen_config: dict):
+    """Return the shared ResponseCache, or None when caching is disabled in gen_config."""
+    global _cache
+    if _cache is None and gen_config.get('cache', False):
+        _cache = ResponseCache(
+            gen_config.get('cache_path', "cache/responses.jsonl"),
+            semantic=gen_config.get('semantic_cache', False)
+        )
+    return _cache
+
+
+@functools.lru_cache(maxsize=None)
+def _supports_n(model: str) -> bool:
+    """Whether the provider accepts n= to return several completions from one request."""
     try:
-        if reasoning_effort == "None":
-            response = await acompletion(
-                model=model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=temperature,
-                max_tokens=max_tokens,
-                timeout=timeout,
-                drop_params=True
-            )
+        return 'n' in (litellm.get_supported_openai_params(model=model) or [])
+    except Exception:
+        return False
+
+
+def _unpack_choices(result, n_candidates: int) -> List[tuple]:
+    """
+    Split a successful n= completion into per-candidate tuples.
+
+    The shared usage is divided evenly across the returned choices so that
+    per-candidate token counts still sum to what the provider billed.
+
+    Returns:
+        (candidate, duration, prompt_tokens, completion_tokens, total_tokens) per choice.
+    """
+    response = result['response']
+    choices = response.choices[:n_candidates]
+    usage = response.usage
+    share = len(choices)
+    
+    unpacked = []
+    for choice in choices:
+        if choice.message.content is None:
+            logger.warning("Received None response, appending empty proof")
+            proof = ""
         else:
-            response = await acompletion(
-                model=model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=temperature,
-                max_tokens=max_tokens,
-                timeout=timeout,
-                reasoning_effort=reasoning_effort,
-                drop_params=True
-            )
-        end_time = time.time()
-        return {
-            'response': response,
-            'duration': end_time - start_time,
-            'success': True
-        }
-    except Exception as e:
-        end_time = time.time()
-        return {
-            'response': e,
-            'duration': end_time - start_time,
-            'success': False
-        }
+            proof = extract_proof_from_response(choice.message.content)
+        unpacked.append((
+            proof,
+            result['duration'],
+            usage.prompt_tokens / share if usage else 0,
+            usage.completion_tokens / share if usage else 0,
+            usage.total_tokens / share if usage else 0
+        ))
+    return unpacked
+
+
+def _unpack_result(result) -> tuple:
+    """
+    Classify one timed_completion result.
+
+    Returns:
+        (candidate, duration, prompt_tokens, completion_tokens, total_tokens)
+    """
+    if isinstance(result, Exception):
+        logger.warning(f"Error in generation: {result}")
+        return "", 0, 0, 0, 0
+    if not result['success'] or isinstance(result['response'], Exception):
+        logger.warning(f"Error in generation: {result['response']}")
+        return "", result['duration'], 0, 0, 0
+    
+    response = result['response']
+    if response.choices[0].message.content is None:
+        logger.warning("Received None response, appending empty proof")
+        usage = response.usage
+        return (
+            "",
+            result['duration'],
+            usage.prompt_tokens if usage else 0,
+            usage.completion_tokens if usage else 0,
+            usage.total_tokens if usage else 0
+        )
+    
+    proof = extract_proof_from_response(response.choices[0].message.content)
+    return (
+        proof,
+        result['duration'],
+        response.usage.prompt_tokens,
+        response.usage.completion_tokens,
+        response.usage.total_tokens
+    )
 
 
 async def generate(system_prompt: str, prompt: str, gen_config: dict) -> list[str]:
@@ -164,75 +333,29 @@ async def generate(system_prompt: str, prompt: str, gen_config: dict) -> list[st
         List of lists of generated proofs, one list per prompt.
     """
     n_candidates = gen_config['n_candidates']
-    batch_size = gen_config.get('batch_size', 3)
-  
-    candidates = []
-    durations = []
-    prompt_tokens = []
-    completion_tokens = []
-    total_tokens = []
-        
-    for i in range(0, n_candidates, batch_size):
-        batch_candidates = []
-        batch_durations = []
-        batch_prompt_tokens = []
-        batch_completion_tokens = []
-        batch_total_tokens = []
-        current_batch_size = min(batch_size, n_candidates - i)
-        try:
-            tasks = []
-            for _ in range(current_batch_size):
-                task = timed_completion(system_prompt, prompt, gen_config)
-                tasks.append(task)
-            
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            for result in results:
-                if isinstance(result, Exception):
-                    logger.warning(f"Error in generation: {result}")
-                    batch_candidates.append("")
-                    batch_durations.append(0)
-                    batch_prompt_tokens.append(0)
-                    batch_completion_tokens.append(0)
-                    batch_total_tokens.append(0)
-                elif not result['success'] or isinstance(result['response'], Exception):
-                    logger.warning(f"Error in generation: {result['response']}")
-                    batch_candidates.append("")
-                    batch_durations.append(result['duration'])
-                    batch_prompt_tokens.append(0)
-                    batch_completion_tokens.append(0)
-                    batch_total_tokens.append(0)
-                elif result['response'].choices[0].message.content is None:
-                    logger.warning("Received None response, appending empty proof")
-                    batch_candidates.append("")
-                    batch_durations.append(result['duration'])
-                    batch_prompt_tokens.append(result['response'].usage.prompt_tokens if result['response'].usage else 0)
-                    batch_completion_tokens.append(result['response'].usage.completion_tokens if result['response'].usage else 0)
-                    batch_total_tokens.append(result['response'].usage.total_tokens if result['response'].usage else 0)
-                else:
-                    proof = extract_proof_from_response(result['response'].choices[0].message.content)
-                    batch_candidates.append(proof)
-                    batch_durations.append(result['duration'])
-                    batch_prompt_tokens.append(result['response'].usage.prompt_tokens)
-                    batch_completion_tokens.append(result['response'].usage.completion_tokens)
-                    batch_total_tokens.append(result['response'].usage.total_tokens)
-            
-            candidates.extend(batch_candidates)
-            durations.extend(batch_durations)
-            prompt_tokens.extend(batch_prompt_tokens)
-            completion_tokens.extend(batch_completion_tokens)
-            total_tokens.extend(batch_total_tokens)
-                
-        except Exception as e:
-            logger.error(f"Batch generation error: {e}")
-            candidates.extend([""] * current_batch_size)
-            durations.extend([0] * current_batch_size)
-            prompt_tokens.extend([0] * current_batch_size)
-            completion_tokens.extend([0] * current_batch_size)
-            total_tokens.extend([0] * current_batch_size)
-        
-        if i + batch_size < n_candidates:
-            await asyncio.sleep(3)
+    
+    unpacked = []
+    
+    # With use_n, ask for all candidates in one request when the provider supports n=, so the prompt is prefilled once.
+    # Each candidate's token counts are then an even share of that one request, not a call of its own.
+    # The per-sample cache needs one request per sample, so n= is only used without it.
+    if (n_candidates > 1 and gen_config.get('use_n', False) and _get_response_cache(gen_config) is None
+            and _supports_n(gen_config['model'])):
+        result = await _request_completion(system_prompt, prompt, gen_config, n=n_candidates)
+        if result['success']:
+            unpacked = _unpack_choices(result, n_candidates)
+        else:
+            logger.warning(f"Error in n={n_candidates} generation, falling back to separate requests: {result['response']}")
+    
+    # Any candidates still missing are requested at once; the shared semaphore keeps us within rate limits
+    tasks = [timed_completion(system_prompt, prompt, gen_config, sample_idx) for sample_idx in range(len(unpacked), n_candidates)]
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    unpacked.extend(_unpack_result(result) for result in results)
+    
+    # Transpose the per-candidate tuples into the five per-field lists in one step
+    candidates, durations, prompt_tokens, completion_tokens, total_tokens = (
+        list(column) for column in zip(*unpacked)
+    ) if unpacked else ([], [], [], [], [])
         
     logger.info(f"Generated {len(candidates)} candidates")
     
@@ -243,28 +366,63 @@ def generate_hint_for_false_attempts(statement_data: Dict, max_attempts: int = 3
     statement_idx = statement_data["statement_idx"]
     false_attempts = statement_data["false_attempts"]
     
-    if seed is not None:
-        random.seed(seed + statement_idx)
+    # A private generator keeps seeding local to this call instead of mutating global state
+    rng = random.Random(seed + statement_idx) if seed is not None else random
     
     num_attempts = min(len(false_attempts), max_attempts)
-    selected_attempts = random.sample(false_attempts, num_attempts)
-    
-    prompt_parts = []
-    for i, attempt in enumerate(selected_attempts, 1):
-        proof = attempt["proof"]
-        error_message = attempt["error_message"]
-        if error_message is None:
-            error_message = "No error message available"
-        
-        prompt_parts.append(f"False Attempt {i}:")
-        prompt_parts.append(proof)
-        prompt_parts.append(f"Error Message: {error_message}")
-        prompt_parts.append("")
-    
-    if prompt_parts and prompt_parts[-1] == "":
-        prompt_parts.pop()
+    selected_attempts = rng.sample(false_attempts, num_attempts)
     
-    return "\n".join(prompt_parts) 
+    return "\n\n".join(
+        f"False Attempt {i}:\n{attempt['proof']}\n"
+        f"Error Message: {attempt['error_message'] if attempt['error_message'] is not None else 'No error message available'}"
+        for i, attempt in enumerate(selected_attempts, 1)
+    )
+
+
+async def run_all(prompts: Dict[int, tuple[str, str]], gen_config: dict, output_file=None) -> List[Dict]:
+    """
+    Generate proofs for all statements concurrently under a single event loop.
+
+    Args:
+        prompts: (system_prompt, prompt) pair for each statement to generate, keyed by statement_idx.
+        gen_config: Generation parameters passed to litellm.
+        output_file: If given, each result is appended to it as a JSON line as soon as it completes.
+
+    Returns:
+        One generation result per statement in prompts, in the same order.
+    """
+    # Bound the number of statements in flight to stay within provider rate limits
+    sem = asyncio.Semaphore(gen_config.get('global_concurrency', 32))
+
+    async def one(idx: int, system_prompt: str, prompt: str) -> Dict:
+        async with sem:
+            candidates, durations, prompt_tokens, completion_tokens, total_tokens = await generate(system_prompt, prompt, gen_config)
+        result = {
+            'statement_idx': idx,
+            'candidates': candidates,
+            'durations': durations,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': total_tokens,
+        }
+        if output_file is not None:
+            output_file.write(json.dumps(result) + '\n')
+            output_file.flush()
+        return result
+
+    # One keep-alive connection pool for the whole run, so requests skip repeated TCP/TLS handshakes
+    litellm.aclient_session = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=256, max_keepalive_connections=64),
+        timeout=httpx.Timeout(gen_config['timeout'])
+    )
+    try:
+        return await tqdm_asyncio.gather(
+            *(one(idx, system_prompt, prompt) for idx, (system_prompt, prompt) in prompts.items()),
+            total=len(prompts)
+        )
+    finally:
+        await litellm.aclient_session.aclose()
+        litellm.aclient_session = None
 
 
 if __name__ == "__main__":
@@ -298,6 +456,13 @@ if __name__ == "__main__":
         'n_candidates': 6,
         'timeout': 60,
         'batch_size': 6,
+        'max_concurrent_requests': 64,
+        'global_concurrency': 32,
+        'cache': False,
+        'semantic_cache': False,
+        'coalesce': False,
+        'use_n': False,
+        'max_retries': 3,
         'reasoning_effort': "None"
     }
     
@@ -315,13 +480,15 @@ if __name__ == "__main__":
     if gen_config['reasoning_effort'] != "None" and not litellm.supports_reasoning(model=model):
         raise ValueError(f"Model {model} does not support reasoning effort, but got {gen_config['reasoning_effort']}")
     
-    tasks = load_dataset("/Users/siyuange/Documents/lean_llm_test/data/minif2f/minif2f.jsonl")
+    tasks = load_jsonl("/Users/siyuange/Documents/lean_llm_test/data/minif2f/minif2f.jsonl")
     
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    # Set to the timestamp of an interrupted run to resume it from its .partial file
+    resume_timestamp = None
+    
+    timestamp = resume_timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
     w_or_wo = "wo" if used_context == "False" else "w"
     output_filename = f"experiment_results_{model_name}_{w_or_wo}_{timestamp}_generation.jsonl"
-    
-    results = []
+    partial_filename = output_filename + ".partial"
     
     if used_context == "True":
         system_prompt_template = system_prompt_w_context_template
@@ -334,19 +501,20 @@ if __name__ == "__main__":
         raise ValueError(f"Used hints must be one of {allowed_hints}, but got {used_hints}")
     
     if used_hints == "proof_idea":
-        raw_hints = load_dataset("/Users/siyuange/Documents/lean_llm_test/data/minif2f/minif2f_proof_ideas.jsonl")
-        hints = [r['proof_idea'] for r in raw_hints]
+        raw_hints = load_jsonl("/Users/siyuange/Documents/lean_llm_test/data/minif2f/minif2f_proof_ideas.jsonl")
+        hints = {r['statement_idx']: r['proof_idea'] for r in raw_hints}
         additional_guidelines = "- Follow the provided proof idea as a guideline for generating the formal proof"
         hints_section_template = "### Proof Idea:\n{hint}\n"
     elif used_hints == "goal_state":
-        raw_hints = load_dataset("/Users/siyuange/Documents/lean_llm_test/data/minif2f/minif2f_goal_states.jsonl")
-        hints = [r['goal_state'] for r in raw_hints]
+        raw_hints = load_jsonl("/Users/siyuange/Documents/lean_llm_test/data/minif2f/minif2f_goal_states.jsonl")
+        hints = {r['statement_idx']: r['goal_state'] for r in raw_hints}
         additional_guidelines = "- Generate a complete proof based on the current goal state"
         hints_section_template = "### Initial Goal State:\n{hint}\n"
     elif used_hints == "false_attempts":
-        # raw_hints = load_dataset(f"/Users/siyuange/Documents/lean_llm_test/data/minif2f/minif2f_{model_name}_false_attempts.jsonl")
-        raw_hints = load_dataset(f"/Users/siyuange/Documents/lean_llm_test/data/minif2f/minif2f_{model_name}-disable_false_attempts.jsonl")
-        hints = [generate_hint_for_false_attempts(r, max_attempts=3) for r in raw_hints]
+        # raw_hints = load_jsonl(f"/Users/siyuange/Documents/lean_llm_test/data/minif2f/minif2f_{model_name}_false_attempts.jsonl")
+        raw_hints = load_jsonl(f"/Users/siyuange/Documents/lean_llm_test/data/minif2f/minif2f_{model_name}-disable_false_attempts.jsonl")
+        # Formatted lazily below, only for statements that still need generating
+        hints = {r['statement_idx']: r for r in raw_hints}
         additional_guidelines = "- Previous **false** attempts are provided\n- **Avoid** the error made in the false attempts"
         hints_section_template = "### Previous False Attempts:\n{hint}\n"
     else:
@@ -354,18 +522,28 @@ if __name__ == "__main__":
         additional_guidelines = ""
         hints_section_template = None
     
-    for idx, task in tqdm(enumerate(tasks)):
+    # The system prompt is identical for every statement, so format it once
+    system_prompt = system_prompt_template.format(
+        additional_guidelines=additional_guidelines
+    )
+    
+    # Results are streamed to the .partial file as they complete, so an interrupted run loses no work
+    results = read_partial(partial_filename)
+    if results:
+        print(f"Resuming from {partial_filename}: {len(results)} statements already generated")
+    completed = {r['statement_idx'] for r in results}
+    
+    prompts = {}
+    for idx, task in enumerate(tasks):
+        if idx in completed:
+            continue
         context = task['srcContext']
         theorem = task['theoremStatement']
         
-        system_prompt = system_prompt_template.format(
-            additional_guidelines=additional_guidelines
-        )
-            
-        if hints_section_template is None or hints is None or hints[idx] is None:
-            hints_section = ""
-        else:
-            hints_section = hints_section_template.format(hint=hints[idx])
+        hint = hints.get(idx) if hints is not None else None
+        if hint is not None and used_hints == "false_attempts":
+            hint = generate_hint_for_false_attempts(hint, max_attempts=3)
+        hints_section = "" if hint is None else hints_section_template.format(hint=hint)
         
         prompt = whole_proof_prompt_template.format(
             src_context=context,
@@ -373,18 +551,7 @@ if __name__ == "__main__":
             hints_section=hints_section
         )
         
-        candidates, durations, prompt_tokens, completion_tokens, total_tokens = asyncio.run(generate(system_prompt, prompt, gen_config))
-        
-        result = {
-            'statement_idx': idx,
-            'candidates': candidates,
-            'durations': durations,
-            'prompt_tokens': prompt_tokens,
-            'completion_tokens': completion_tokens,
-            'total_tokens': total_tokens,
-        }
-        
-        results.append(result)
+        prompts[idx] = (system_prompt, prompt)
     
     setting = {
         'model': model_name,
@@ -401,15 +568,15 @@ if __name__ == "__main__":
         'timestamp': timestamp,
     }  
     
+    write_partial(partial_filename, setting, results)
+    
+    with open(partial_filename, "a", buffering=1) as f:
+        results.extend(asyncio.run(run_all(prompts, gen_config, output_file=f)))
+    results.sort(key=lambda r: r['statement_idx'])
+    
     with open(output_filename, "w") as f:
         f.write(json.dumps({"experiment_setting": setting}) + '\n')
         f.write(json.dumps({"generation_results": results}) + '\n')
+    os.remove(partial_filename)
         
     print(f"Results saved to {output_filename}")
-    
-    
-    
-    
-    
-    
-    
\ No newline at end of file
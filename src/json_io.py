@@ -0,0 +1,73 @@
+"""
+JSON and JSONL reading and writing shared by the generation, validation and analysis code.
+
+orjson is used when it is installed; otherwise the stdlib json module is used.
+"""
+
+import json
+import mmap
+import os
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+loads_json = orjson.loads if orjson is not None else json.loads
+
+
+def dumps_json(obj: Any) -> bytes:
+    """Serialize obj as one line of UTF-8 JSON, without the trailing newline."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+def load_jsonl(file_path: str) -> list:
+    """Load a JSONL file and return a list of JSON objects, skipping blank lines."""
+    with open(file_path, 'rb') as f:
+        # mmap cannot map an empty file
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+        # Parse lines straight out of the page cache instead of copying the whole file first
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return [loads_json(line) for line in iter(mm.readline, b'') if line.strip()]
+
+
+def load_generation(generation_path: str):
+    """Return the (experiment_setting, generation_results) of a generation file."""
+    # Only the setting and results lines are needed, so nothing past them is read
+    with open(generation_path, 'rb') as f:
+        settings = loads_json(f.readline())["experiment_setting"]
+        generations = loads_json(f.readline())["generation_results"]
+    return settings, generations
+
+
+# A .partial file holds the results of an interrupted run: an {"experiment_setting": ...} header line,
+# then one result per line, appended as each result completes
+def read_partial(partial_path: str) -> list:
+    """Return the results saved in a .partial file, or [] when there is none."""
+    results = []
+    if not os.path.exists(partial_path):
+        return results
+    with open(partial_path, 'rb') as f:
+        # An empty file means the run died before the header was written, so nothing was saved yet
+        next(f, None)
+        for line in f:
+            try:
+                results.append(loads_json(line))
+            except ValueError:
+                # Last line was cut off by the interruption
+                break
+    return results
+
+
+def write_partial(partial_path: str, settings: dict, results: list) -> None:
+    """Start a .partial file with its header and the results kept from an earlier run, ready to append to."""
+    # Rewriting the file drops a truncated trailing line before new results are appended
+    with open(partial_path, 'wb') as f:
+        f.write(dumps_json({"experiment_setting": settings}) + b'\n')
+        for result in results:
+            f.write(dumps_json(result) + b'\n')
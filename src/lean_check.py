@@ -0,0 +1,328 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+
+from lean_interact import *
+from lean_interact.interface import LeanError, Pos
+
+from json_io import dumps_json, loads_json
+
+
+
+# Each pool worker keeps its own Lean server for every theorem it checks
+_server = None
+# Context environments already built on this worker's server, keyed by context code
+_env_cache = {}
+# The REPL config the worker's server was started with, so jobs do not have to ship it along
+_config = None
+# Connection to the on-disk memo of (context, statement, proof) verdicts shared by all workers and runs
+_memo = None
+
+
+def worker_init(config, contexts=(), memo_path=None):
+    global _server, _config, _memo
+    _config = config
+    _server = LeanServer(config)
+    if memo_path is not None:
+        _memo = _open_memo(memo_path)
+    # Elaborate the contexts most theorems share up front, so no theorem waits on them mid-run
+    for context_code in contexts:
+        try:
+            _get_context_env(context_code)
+        except Exception as e:
+            print(f"Error preloading context: {str(e)}")
+
+
+def _open_memo(memo_path: str):
+    os.makedirs(os.path.dirname(memo_path) or ".", exist_ok=True)
+    # Every worker holds its own connection; WAL lets them read while another one writes
+    conn = sqlite3.connect(memo_path, timeout=60)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE IF NOT EXISTS results (key BLOB PRIMARY KEY, result BLOB)")
+    conn.commit()
+    return conn
+
+
+def _memo_key(context_code: str, theorem_statement: str, proof: str) -> bytes:
+    h = hashlib.blake2b(digest_size=20)
+    for part in (context_code, theorem_statement, proof):
+        h.update(part.encode('utf-8'))
+        h.update(b'\0')
+    return h.digest()
+
+
+def _memo_get(keys: list[bytes]) -> dict:
+    """Return the memoized (correctness, error_position, error_message, compiled_line_count) of each known key."""
+    known = {}
+    for key in keys:
+        row = _memo.execute("SELECT result FROM results WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            known[key] = tuple(loads_json(row[0]))
+    return known
+
+
+def _memo_put(keys: list[bytes], columns) -> None:
+    # Only settled verdicts are remembered; a timeout may well succeed on another try
+    rows = [(key, dumps_json(result)) for key, result in zip(keys, zip(*columns)) if result[0] is not None]
+    if rows:
+        _memo.executemany("INSERT OR IGNORE INTO results VALUES (?, ?)", rows)
+        _memo.commit()
+
+
+def restart_server():
+    """Replace a server that timed out or crashed; the environments it built are gone with it."""
+    global _server
+    if _server is not None:
+        try:
+            _server.kill()
+        except Exception:
+            pass
+    _env_cache.clear()
+    _server = LeanServer(_config)
+
+
+def _get_context_env(context_code: str):
+    # Theorems from the same source file share their context, so elaborate it only once per server
+    context_env = _env_cache.get(context_code)
+    if context_env is None:
+        context_res = _server.run(Command(cmd=context_code))
+        assert not isinstance(context_res, LeanError)
+        context_env = context_res.env
+        _env_cache[context_code] = context_env
+    return context_env
+
+
+def _nlines(text: str) -> int:
+    """Number of lines in text, counted as Lean counts them, without building the list of lines."""
+    return text.count('\n') + (1 if text and not text.endswith('\n') else 0)
+
+
+# The named header of the declaration to prove, e.g. "theorem mathd_algebra_10"
+DECLARATION_HEADER_RE = re.compile(r'\b(?:theorem|lemma)\s+[^\s(\[{:]+')
+# Line and block comments, removed before looking for commands so prose in them does not count
+LEAN_COMMENT_RE = re.compile(r'/-.*?-/|--[^\n]*', re.DOTALL)
+# A command inside a proof that could change what the following candidates see or run code when elaborated.
+# Lean starts a new command wherever one of these keywords appears, so they are matched anywhere, not just at
+# a line start; a false match only costs the batch, since the candidates are then checked one by one
+ENV_CHANGING_COMMAND_RE = re.compile(
+    r"(?<![\w.'])(?:theorem|lemma|def|abbrev|instance|axiom|opaque|structure|inductive|class|example|attribute|"
+    r"macro|macro_rules|syntax|elab|elab_rules|notation|infix|infixl|infixr|prefix|postfix|declare_syntax_cat|"
+    r"run_cmd|run_elab|run_meta|initialize|builtin_initialize|deriving|mutual|namespace|section|end)(?![\w.'!?])"
+    r"|#[a-z_]+"
+)
+
+
+def check_proofs_batched(context_env: int, timeout: int, theorem_statement: str, proofs: list[str]):
+    """
+    Check all proofs in a single Lean command, each as an anonymous `example` so no candidate, failed or not,
+    adds a declaration a later one could use (e.g. through `exact?`).
+    Returns None when the batch cannot be attributed candidate by candidate, so the caller can check them one by one.
+    """
+    header = DECLARATION_HEADER_RE.search(theorem_statement)
+    if header is None or any(ENV_CHANGING_COMMAND_RE.search(LEAN_COMMENT_RE.sub('', proof)) for proof in proofs):
+        return None
+    example_statement = theorem_statement[:header.start()] + "example" + theorem_statement[header.end():]
+    
+    # Dropping the name shifts the rest of the header line left; shift reported columns back so they match the original
+    header_line = theorem_statement.count('\n', 0, header.start()) + 1
+    header_end_column = header.start() - (theorem_statement.rfind('\n', 0, header.start()) + 1) + len("example")
+    column_shift = (header.end() - header.start()) - len("example")
+    
+    def original_position(pos, offset):
+        line = pos.line - offset
+        if line == header_line and pos.column >= header_end_column:
+            return (line, pos.column + column_shift)
+        return (line, pos.column)
+    
+    lines = []
+    spans = []
+    for i, proof in enumerate(proofs):
+        lines.append(f"namespace Candidate{i}")
+        first_line = len(lines) + 1
+        lines.extend((example_statement + " := " + proof).split('\n'))
+        last_line = len(lines)
+        lines.append(f"end Candidate{i}")
+        # A marker after every candidate proves that none of them swallowed the following ones (e.g. an unclosed comment)
+        lines.append(f'#print "candidate {i} checked"')
+        spans.append((first_line, last_line, len(lines)))
+
+    lean_output = _server.run(Command(cmd="\n".join(lines), env=context_env), timeout=timeout)
+    if isinstance(lean_output, LeanError):
+        return None
+
+    candidate_messages = [[] for _ in proofs]
+    markers = set()
+    for message in lean_output.messages:
+        if message.start_pos is None:
+            return None
+        line = message.start_pos.line
+        for i, (first_line, last_line, marker_line) in enumerate(spans):
+            if first_line <= line <= last_line:
+                candidate_messages[i].append(message)
+                break
+            if line == marker_line and message.data.strip() == f"candidate {i} checked":
+                markers.add(i)
+                break
+        else:
+            return None
+    if len(markers) != len(proofs):
+        return None
+
+    correctness = []
+    error_messages = []
+    error_positions = []
+    compiled_line_counts = []
+    num_statement_lines = _nlines(theorem_statement)
+
+    for i, proof in enumerate(proofs):
+        first_line, last_line, _ = spans[i]
+        # Positions are reported relative to the candidate's own code, as if it had been checked alone
+        offset = first_line - 1
+        if lean_output.lean_code_is_valid(
+            start_pos=Pos(line=first_line, column=0), end_pos=Pos(line=last_line, column=len(lines[last_line - 1])), allow_sorry=False
+        ):
+            correctness.append(True)
+            error_messages.append(None)
+            error_positions.append(None)
+            compiled_line_counts.append(_nlines(proof))
+        elif not candidate_messages[i]:
+            return None
+        else:
+            correctness.append(False)
+            message = candidate_messages[i][0]
+            error_messages.append(message.data)
+            error_positions.append({
+                'start_pos': original_position(message.start_pos, offset),
+                'end_pos': original_position(message.end_pos, offset)
+            } if message.end_pos else None)
+            compiled_line_counts.append(message.start_pos.line - offset - num_statement_lines)
+
+    return correctness, error_positions, error_messages, compiled_line_counts
+
+
+def _check_proof(timeout: int, context_code: str, theorem_statement: str, proof: str, num_statement_lines: int):
+    """
+    Check one proof on its own and return its (correctness, error_position, error_message, compiled_line_count).
+    """
+    try:
+        lean_output = _server.run(
+            Command(cmd=theorem_statement + " := " + proof, env=_get_context_env(context_code)), timeout=timeout
+        )
+        if not isinstance(lean_output, LeanError) and lean_output.lean_code_is_valid(allow_sorry=False):
+            return True, None, None, _nlines(proof)
+        elif isinstance(lean_output, LeanError):
+            return False, None, lean_output.message, None
+        else:
+            message = lean_output.messages[0]
+            start_pos, end_pos = message.start_pos, message.end_pos
+            if start_pos is None:
+                return False, None, message.data, None
+            if end_pos is None:
+                return False, None, message.data, start_pos.line - num_statement_lines
+            error_position = {
+                'start_pos': (start_pos.line, start_pos.column),
+                'end_pos': (end_pos.line, end_pos.column)
+            }
+            return False, error_position, message.data, start_pos.line - num_statement_lines
+            
+    except (TimeoutError, ConnectionAbortedError, json.JSONDecodeError):
+        restart_server()
+        return None, None, None, None
+
+
+def check_context_proofs(job: tuple[int, int, str, str, list[str]], batch: bool = True, early_exit: bool = False, adaptive_timeout: bool = False):
+    """
+    Check the correctness of the given proofs for a given context and declaration to prove.
+    With batch, first try all proofs in one command; pass batch=False when the proofs are known to run long,
+    since a batch shares one time budget and a hanging proof spends all of it before the fallback re-runs it.
+    With early_exit, stop at the first correct proof and leave the remaining candidates unchecked (None);
+    memoized verdicts are still used, and a memoized correct proof means no proof is sent to Lean at all.
+    early_exit checks the proofs one at a time, so it never uses the batch.
+    With adaptive_timeout, first give every proof a quarter of the timeout and retry only the ones that ran out.
+    Every proof that runs out restarts the Lean server and re-imports the context, so this only pays off
+    when few proofs are slow.
+    """
+    idx, timeout_per_proof, context_code, theorem_statement, proofs = job
+
+    if _server is None:
+        raise RuntimeError("check_context_proofs needs a Lean server; call worker_init first")
+
+    # Generators often repeat a proof verbatim; check each distinct proof once and copy its verdict to every copy
+    unique_proofs = list(dict.fromkeys(proofs))
+    if len(unique_proofs) < len(proofs):
+        idx, *results = check_context_proofs(
+            (idx, timeout_per_proof, context_code, theorem_statement, unique_proofs),
+            batch=batch,
+            early_exit=early_exit,
+            adaptive_timeout=adaptive_timeout
+        )
+        position = {proof: i for i, proof in enumerate(unique_proofs)}
+        return (idx, *([column[position[proof]] for proof in proofs] for column in results))
+
+    # A proof already checked for the same context and statement, by any worker in this run or an earlier one,
+    # keeps its verdict; only the rest go to Lean
+    keys = None
+    if _memo is not None:
+        keys = [_memo_key(context_code, theorem_statement, proof) for proof in proofs]
+        known = _memo_get(keys)
+        if early_exit and any(result[0] is True for result in known.values()):
+            unchecked = (None, None, None, None)
+            return (idx, *(list(column) for column in zip(*(known.get(key, unchecked) for key in keys))))
+        if known:
+            unknown = [(key, proof) for key, proof in zip(keys, proofs) if key not in known]
+            if unknown:
+                _, *results = check_context_proofs(
+                    (idx, timeout_per_proof, context_code, theorem_statement, [proof for _, proof in unknown]),
+                    batch=batch,
+                    early_exit=early_exit,
+                    adaptive_timeout=adaptive_timeout
+                )
+                known.update(zip((key for key, _ in unknown), zip(*results)))
+            return (idx, *(list(column) for column in zip(*(known[key] for key in keys))))
+
+    # One round-trip for all candidates; fall back to checking them one by one if the batch is unusable.
+    # Stopping at the first success needs the proofs one at a time, so early_exit skips the batch
+    if batch and len(proofs) > 1 and not early_exit:
+        try:
+            batch_result = check_proofs_batched(
+                _get_context_env(context_code), timeout_per_proof * len(proofs), theorem_statement, proofs
+            )
+            # Batch verdicts are not memoized: with a shared time budget, a slow proof may pass here yet time out
+            # on its own, and the memo must only hold verdicts that do not depend on the path that produced them
+            if batch_result is not None:
+                return (idx, *batch_result)
+        except (TimeoutError, ConnectionAbortedError, json.JSONDecodeError):
+            restart_server()
+
+    num_statement_lines = _nlines(theorem_statement)
+    first_timeout = max(5, timeout_per_proof // 4) if adaptive_timeout else timeout_per_proof
+    results = []
+    timed_out = []
+    
+    for i, proof in enumerate(proofs):
+        result = _check_proof(first_timeout, context_code, theorem_statement, proof, num_statement_lines)
+        results.append(result)
+        if result[0] is None:
+            timed_out.append(i)
+        if early_exit and result[0] is True:
+            results.extend([(None, None, None, None)] * (len(proofs) - len(results)))
+            break
+    else:
+        # Proofs that only ran out of the short budget get one more try with the full timeout
+        if first_timeout < timeout_per_proof:
+            for i in timed_out:
+                results[i] = _check_proof(timeout_per_proof, context_code, theorem_statement, proofs[i], num_statement_lines)
+                if early_exit and results[i][0] is True:
+                    break
+
+    correctness = [result[0] for result in results]
+    error_positions = [result[1] for result in results]
+    error_messages = [result[2] for result in results]
+    compiled_line_counts = [result[3] for result in results]
+
+    if keys is not None:
+        _memo_put(keys, (correctness, error_positions, error_messages, compiled_line_counts))
+
+    return idx, correctness, error_positions, error_messages, compiled_line_counts
@@ -1,16 +1,18 @@
 import json
 from pathlib import Path
 import os
+from concurrent.futures import ProcessPoolExecutor
 
-def load_jsonl(file_path):
-    """Load a JSONL file and return a list of JSON objects."""
-    data = []
-    with open(file_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if line:
-                data.append(json.loads(line))
-    return data
+from json_io import load_jsonl, orjson
+
+def _dumps_indented(obj, level):
+    """Serialize obj with 2-space indentation as if nested `level` levels deep."""
+    if orjson is not None:
+        data = orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    else:
+        data = json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+    # JSON strings never contain raw newlines, so every newline is a line break to re-indent
+    return data.replace(b'\n', b'\n' + b'  ' * level)
 
 def combine_files(problems_file, generation_file, validation_file, output_file):
     """Combine the three JSONL files into the specified format."""
@@ -46,84 +48,76 @@ def combine_files(problems_file, generation_file, validation_file, output_file):
                 stmt_idx = result["statement_idx"]
                 validation_results[stmt_idx] = result
     
-    # Create the combined structure
-    combined_data = {
-        "experiment_setting": experiment_setting,
-        "results": {}
-    }
-    
-    # Process each problem
-    print("Combining data...")
-    for stmt_idx, problem in enumerate(problems_data):
-        if stmt_idx in generation_results and stmt_idx in validation_results:
-            gen_result = generation_results[stmt_idx]
-            val_result = validation_results[stmt_idx]
-            
-            # Create candidates list
-            candidates = []
-            n_candidates = len(gen_result["candidates"])
-            
-            for i in range(n_candidates):
-                if val_result["correctness"] is None:
-                    candidate = {
+    # Stream each result entry to the output file as it is built, so only one problem is held in memory
+    print(f"Combining data into {output_file}...")
+    total_problems = 0
+    total_candidates = 0
+    correct_candidates = 0
+    # Results are keyed by theorem name, so a repeated name is written once to keep every key unique
+    written_names = set()
+    with open(output_file, 'wb') as f:
+        f.write(b'{\n  "experiment_setting": ' + _dumps_indented(experiment_setting, 1) + b',\n  "results": {')
+        for stmt_idx, problem in enumerate(problems_data):
+            if problem["theoremName"] in written_names:
+                print(f"Warning: Skipping statement {stmt_idx}, theorem name {problem['theoremName']} is already in the results")
+            elif stmt_idx in generation_results and stmt_idx in validation_results:
+                gen_result = generation_results[stmt_idx]
+                val_result = validation_results[stmt_idx]
+                validated = val_result["correctness"] is not None
+                
+                # Create candidates list
+                candidates = []
+                n_candidates = len(gen_result["candidates"])
+                
+                for i in range(n_candidates):
+                    is_correct = val_result["correctness"][i] if validated else None
+                    candidates.append({
                         "proof": gen_result["candidates"][i],
-                        "is_correct": None,
+                        "is_correct": is_correct,
                         "duration": gen_result["durations"][i],
                         "prompt_tokens": gen_result["prompt_tokens"][i],
                         "completion_tokens": gen_result["completion_tokens"][i],
                         "total_tokens": gen_result["total_tokens"][i],
-                        "compiled_lines": None,
-                        "error_message": None,
-                        "error_position": None
-                    }
-                else:
-                    candidate = {
-                        "proof": gen_result["candidates"][i],
-                        "is_correct": val_result["correctness"][i],
-                        "duration": gen_result["durations"][i],
-                        "prompt_tokens": gen_result["prompt_tokens"][i],
-                        "completion_tokens": gen_result["completion_tokens"][i],
-                        "total_tokens": gen_result["total_tokens"][i],
-                        "compiled_lines": val_result["compiled_line_counts"][i],
-                        "error_message": val_result["error_messages"][i],
-                        "error_position": val_result["error_positions"][i]
-                    }
-                candidates.append(candidate)
-            
-            # Create the result entry
-            combined_data["results"][problem["theoremName"]] = {
-                "theoremStatement": problem["theoremStatement"],
-                "theoremName": problem["theoremName"],
-                "candidates": candidates
-            }
-        else:
-            print(f"Warning: Missing generation or validation data for statement {stmt_idx}")
-    
-    # Write the combined data to output file
-    print(f"Writing combined data to {output_file}...")
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(combined_data, f, indent=2, ensure_ascii=False)
-    
-    print(f"Successfully combined {len(combined_data['results'])} problems into {output_file}")
+                        "compiled_lines": val_result["compiled_line_counts"][i] if validated else None,
+                        "error_message": val_result["error_messages"][i] if validated else None,
+                        "error_position": val_result["error_positions"][i] if validated else None
+                    })
+                    if is_correct:
+                        correct_candidates += 1
+                total_candidates += n_candidates
+                
+                # Write the result entry
+                entry = {
+                    "theoremStatement": problem["theoremStatement"],
+                    "theoremName": problem["theoremName"],
+                    "candidates": candidates
+                }
+                f.write((b',\n    ' if total_problems else b'\n    ') + _dumps_indented(problem["theoremName"], 2) + b': ' + _dumps_indented(entry, 2))
+                written_names.add(problem["theoremName"])
+                total_problems += 1
+            else:
+                print(f"Warning: Missing generation or validation data for statement {stmt_idx}")
+        f.write(b'\n  }\n}' if total_problems else b'}\n}')
     
-    # Print some statistics
-    total_candidates = sum(len(result["candidates"]) for result in combined_data["results"].values())
-    correct_candidates = sum(
-        sum(1 for candidate in result["candidates"] if candidate["is_correct"]) 
-        for result in combined_data["results"].values()
-    )
+    print(f"Successfully combined {total_problems} problems into {output_file}")
     
     print(f"Statistics:")
-    print(f"  Total problems: {len(combined_data['results'])}")
+    print(f"  Total problems: {total_problems}")
     print(f"  Total candidates: {total_candidates}")
     print(f"  Correct candidates: {correct_candidates}")
-    print(f"  Success rate: {correct_candidates/total_candidates*100:.2f}%")
+    success_rate = correct_candidates / total_candidates * 100 if total_candidates else 0.0
+    print(f"  Success rate: {success_rate:.2f}%")
+
+def _combine_star(args):
+    """Unpack a job tuple for ProcessPoolExecutor.map."""
+    return combine_files(*args)
 
 def main():
     problems_file = "/Users/siyuange/Documents/lean_llm_test/data/minif2f/minif2f.jsonl"
     
     generation_dir = "/Users/siyuange/Documents/lean_llm_test/results/minif2f/false_attempts"
     
+    jobs = []
     for filename in os.listdir(generation_dir):
         if not filename.endswith("_generation.jsonl"):
             continue
@@ -137,7 +131,11 @@ def main():
                 print(f"Error: File {file_path} does not exist")
                 return
         
-        combine_files(problems_file, generation_file, validation_file, output_file)
+        jobs.append((problems_file, generation_file, validation_file, output_file))
+    
+    # Each file is combined independently, so spread them across cores
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        list(executor.map(_combine_star, jobs))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
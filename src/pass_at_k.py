@@ -1,43 +1,49 @@
-import json
+import csv
 import os
+import re
 import pandas as pd
-import glob
-from collections import defaultdict
-import math
+import fnmatch
+from functools import lru_cache
+
+from json_io import loads_json
+
+# Filename format: experiment_results*_*<model_name>_wo_<timestamp>_results.jsonl
+# The model name is the underscore-free segment right before the first "_wo_"
+MODEL_FROM_FILENAME_RE = re.compile(r'([^_]*)_wo_')
 
 def load_results_from_directory(directory_path):
     """Load all JSONL files matching the pattern from directory, organized by model"""
-    pattern = os.path.join(directory_path, "experiment_results*_*_wo_*_results.jsonl")
-    files = glob.glob(pattern)
+    pattern = "experiment_results*_*_wo_*_results.jsonl"
+    with os.scandir(directory_path) as entries:
+        files = [entry.path for entry in entries if fnmatch.fnmatchcase(entry.name, pattern) and entry.is_file()]
     
     model_results = {}
     
     for file_path in files:
         print(f"Loading {file_path}")
-        with open(file_path, 'r') as f:
-            data = json.load(f)
+        with open(file_path, 'rb') as f:
+            data = loads_json(f.read())
             # Extract model name from the data or filename
-            model_name = data.get('experiment_setting', {}).get('model', 'unknown')
-            reasoning_effort = data.get('experiment_setting', {}).get('reasoning_effort', 'unknown')
-            
-            model_name = model_name + '-' + reasoning_effort
+            experiment_setting = data.get('experiment_setting', {})
+            model_name = experiment_setting.get('model', 'unknown')
+            reasoning_effort = experiment_setting.get('reasoning_effort', 'unknown')
             
-            # If model name is still unknown, try to extract from filename
+            # If the setting has no model name, try to extract it from the filename
             if model_name == 'unknown':
-                filename = os.path.basename(file_path)
-                # Parse filename to extract model name
-                # Format: experiment_results*_*<model_name>_wo_<timestamp>_results.jsonl
-                parts = filename.replace('.jsonl', '').split('_wo_')
-                if len(parts) >= 2:
-                    model_part = parts[0]
-                    # Extract model name (everything after the last underscore before _wo_)
-                    model_name = model_part.split('_')[-1] if '_' in model_part else model_part
+                match = MODEL_FROM_FILENAME_RE.search(os.path.basename(file_path))
+                if match:
+                    model_name = match.group(1)
+            
+            model_name = model_name + '-' + reasoning_effort
             
             if model_name not in model_results:
                 model_results[model_name] = []
             
             # Process each theorem result
             for theorem_name, theorem_data in data.get('results', {}).items():
+                # Count proof lines once here so the analysis never rescans proof text
+                for c in theorem_data.get('candidates', []):
+                    c['_total_lines'] = c['proof'].count('\n') + 1 if c.get('compiled_lines') is not None else 0
                 result = {
                     'theorem_name': theorem_name,
                     'theorem_statement': theorem_data.get('theoremStatement', ''),
@@ -49,197 +55,107 @@ def load_results_from_directory(directory_path):
     
     return model_results
 
-def compute_pass_at_k(candidates, k):
-    """Compute pass@k metric for a list of candidates"""
-    if not candidates:
+# Candidate counts repeat across theorems and models, so only a handful of distinct (n, correct_count, k) are ever seen
+@lru_cache(maxsize=None)
+def compute_pass_at_k(n, correct_count, k):
+    """Compute pass@k metric from the number of candidates and correct candidates"""
+    if n == 0 or correct_count == 0:
         return 0.0
     
-    # Count correct solutions
-    correct_count = sum(1 for c in candidates if c.get('is_correct', False))
-    n = len(candidates)
-    
     if k > n:
         k = n
     
-    if correct_count == 0:
-        return 0.0
-    
-    # pass@k = 1 - C(n-correct, k) / C(n, k)
-    # where C(n,k) is binomial coefficient
-    
-    if correct_count >= k:
+    # Every draw of k candidates contains a correct one
+    if n - correct_count < k:
         return 1.0
     
-    try:
-        numerator = math.comb(n - correct_count, k)
-        denominator = math.comb(n, k)
-        return 1.0 - (numerator / denominator)
-    except:
-        return 0.0
+    # pass@k = 1 - C(n-correct, k) / C(n, k), using the HumanEval product form
+    # C(n-correct, k) / C(n, k) = prod_{i=n-correct+1}^{n} (1 - k/i), which needs only correct_count float steps
+    ratio = 1.0
+    for i in range(n - correct_count + 1, n + 1):
+        ratio *= 1.0 - k / i
+    return 1.0 - ratio
 
-def has_correct_proof(candidates):
-    """Check if there's at least one correct proof"""
-    return any(c.get('is_correct', False) for c in candidates)
+def _group_metrics(group):
+    """Aggregate the per-theorem metrics of one non-empty group of theorems"""
+    total_count = len(group)
+    correct_count = int(group['has_correct'].sum())
+    
+    return {
+        'total_theorems': total_count,
+        'theorems_with_correct_proof': correct_count,
+        'percentage_with_correct_proof': (correct_count / total_count) * 100,
+        'pass_at_1': group['pass_at_1'].sum() / total_count,
+        'pass_at_5': group['pass_at_5'].sum() / total_count,
+        'avg_compiled_ratio': group['compiled_ratio'].sum() / total_count
+    }
 
 def analyze_results(results, model_name):
     """Analyze results and compute all requested metrics for a specific model"""
     
-    # Group by different criteria
-    analyses = {
-        'all_statements': results,
-        'by_category': {},
-        'brute_force_true': [r for r in results if r['brute_force']],
-        'brute_force_false': [r for r in results if not r['brute_force']]
-    }
+    # Flatten every candidate into one table so per-theorem counts come from a single groupby
+    candidates = pd.DataFrame(
+        [
+            (theorem_idx, bool(c.get('is_correct', False)), c['compiled_lines'] or 0, c['_total_lines'])
+            for theorem_idx, r in enumerate(results)
+            for c in r['candidates']
+        ],
+        columns=['theorem', 'is_correct', 'compiled_lines', 'total_lines']
+    ).astype({'is_correct': bool, 'compiled_lines': int, 'total_lines': int})
     
-    # Group by category
-    for result in results:
-        category = result['category']
-        if category not in analyses['by_category']:
-            analyses['by_category'][category] = []
-        analyses['by_category'][category].append(result)
+    theorems = candidates.groupby('theorem').agg(
+        n=('is_correct', 'size'),
+        correct=('is_correct', 'sum'),
+        compiled_lines=('compiled_lines', 'sum'),
+        total_lines=('total_lines', 'sum')
+    ).reindex(range(len(results)), fill_value=0)
+    theorems['category'] = [r['category'] for r in results]
+    theorems['brute_force'] = [bool(r['brute_force']) for r in results]
+    theorems['has_correct'] = theorems['correct'] > 0
+    # has_correct, pass@1 and pass@5 all derive from the same (n, correct) pair; pass@1 is simply c / n
+    theorems['pass_at_1'] = (theorems['correct'] / theorems['n']).where(theorems['n'] > 0, 0.0)
+    theorems['pass_at_5'] = [
+        compute_pass_at_k(n, c, 5)
+        for n, c in zip(theorems['n'].tolist(), theorems['correct'].tolist())
+    ]
+    theorems['compiled_ratio'] = (theorems['compiled_lines'] / theorems['total_lines']).where(theorems['total_lines'] > 0, 0)
+    
+    # Group by different criteria
+    groups = [('all_statements', 'all', theorems)]
+    groups.extend(
+        ('category', category, group)
+        for category, group in theorems.groupby('category', sort=False, dropna=False)
+    )
+    groups.append(('brute_force', 'true', theorems[theorems['brute_force']]))
+    groups.append(('brute_force', 'false', theorems[~theorems['brute_force']]))
     
     # Compute metrics for each group
     metrics_data = []
-    
-    # All statements
-    group_results = analyses['all_statements']
-    if group_results:
-        correct_count = sum(1 for r in group_results if has_correct_proof(r['candidates']))
-        total_count = len(group_results)
-        pass_at_1 = sum(compute_pass_at_k(r['candidates'], 1) for r in group_results) / total_count
-        pass_at_5 = sum(compute_pass_at_k(r['candidates'], 5) for r in group_results) / total_count
-        
-        sum_ratio = 0
-        
-        for r in group_results:
-            compiled_lines_count = 0
-            total_lines_count = 0
-            for c in r['candidates']:
-                compiled_lines_count += c['compiled_lines'] if c['compiled_lines'] is not None else 0
-                total_lines_count += c['proof'].count('\n') + 1 if c['compiled_lines'] is not None else 0
-
-            ratio = compiled_lines_count / total_lines_count if total_lines_count > 0 else 0
-            sum_ratio += ratio
-            
-        avg_compiled_ratio = sum_ratio / total_count if total_count > 0 else 0
-        
-        
+    for group_type, group_name, group in groups:
+        if len(group) == 0:
+            continue
         metrics_data.append({
             'model': model_name,
-            'group_type': 'all_statements',
-            'group_name': 'all',
-            'total_theorems': total_count,
-            'theorems_with_correct_proof': correct_count,
-            'percentage_with_correct_proof': (correct_count / total_count) * 100,
-            'pass_at_1': pass_at_1,
-            'pass_at_5': pass_at_5,
-            'avg_compiled_ratio': avg_compiled_ratio
+            'group_type': group_type,
+            'group_name': group_name,
+            **_group_metrics(group)
         })
     
-    # By category
-    for category, group_results in analyses['by_category'].items():
-        if group_results:
-            correct_count = sum(1 for r in group_results if has_correct_proof(r['candidates']))
-            total_count = len(group_results)
-            pass_at_1 = sum(compute_pass_at_k(r['candidates'], 1) for r in group_results) / total_count
-            pass_at_5 = sum(compute_pass_at_k(r['candidates'], 5) for r in group_results) / total_count
-            
-            sum_ratio = 0
-        
-            for r in group_results:
-                compiled_lines_count = 0
-                total_lines_count = 0
-                for c in r['candidates']:
-                    compiled_lines_count += c['compiled_lines'] if c['compiled_lines'] is not None else 0
-                    total_lines_count += c['proof'].count('\n') + 1 if c['compiled_lines'] is not None else 0
-
-                ratio = compiled_lines_count / total_lines_count if total_lines_count > 0 else 0
-                sum_ratio += ratio
-                
-            avg_compiled_ratio = sum_ratio / total_count if total_count > 0 else 0
-            
-            metrics_data.append({
-                'model': model_name,
-                'group_type': 'category',
-                'group_name': category,
-                'total_theorems': total_count,
-                'theorems_with_correct_proof': correct_count,
-                'percentage_with_correct_proof': (correct_count / total_count) * 100,
-                'pass_at_1': pass_at_1,
-                'pass_at_5': pass_at_5,
-                'avg_compiled_ratio': avg_compiled_ratio
-            })
-    
-    # Brute force = True
-    group_results = analyses['brute_force_true']
-    if group_results:
-        correct_count = sum(1 for r in group_results if has_correct_proof(r['candidates']))
-        total_count = len(group_results)
-        pass_at_1 = sum(compute_pass_at_k(r['candidates'], 1) for r in group_results) / total_count
-        pass_at_5 = sum(compute_pass_at_k(r['candidates'], 5) for r in group_results) / total_count
-        
-        sum_ratio = 0
-        
-        for r in group_results:
-            compiled_lines_count = 0
-            total_lines_count = 0
-            for c in r['candidates']:
-                compiled_lines_count += c['compiled_lines'] if c['compiled_lines'] is not None else 0
-                total_lines_count += c['proof'].count('\n') + 1 if c['compiled_lines'] is not None else 0
+    return metrics_data
 
-            ratio = compiled_lines_count / total_lines_count if total_lines_count > 0 else 0
-            sum_ratio += ratio
-            
-        avg_compiled_ratio = sum_ratio / total_count if total_count > 0 else 0
-        
-        metrics_data.append({
-            'model': model_name,
-            'group_type': 'brute_force',
-            'group_name': 'true',
-            'total_theorems': total_count,
-            'theorems_with_correct_proof': correct_count,
-            'percentage_with_correct_proof': (correct_count / total_count) * 100,
-            'pass_at_1': pass_at_1,
-            'pass_at_5': pass_at_5,
-            'avg_compiled_ratio': avg_compiled_ratio
-        })
-    
-    # Brute force = False
-    group_results = analyses['brute_force_false']
-    if group_results:
-        correct_count = sum(1 for r in group_results if has_correct_proof(r['candidates']))
-        total_count = len(group_results)
-        pass_at_1 = sum(compute_pass_at_k(r['candidates'], 1) for r in group_results) / total_count
-        pass_at_5 = sum(compute_pass_at_k(r['candidates'], 5) for r in group_results) / total_count
-        
-        sum_ratio = 0
-        
-        for r in group_results:
-            compiled_lines_count = 0
-            total_lines_count = 0
-            for c in r['candidates']:
-                compiled_lines_count += c['compiled_lines'] if c['compiled_lines'] is not None else 0
-                total_lines_count += c['proof'].count('\n') + 1 if c['compiled_lines'] is not None else 0
+# Column order of every metrics CSV, matching the keys of the rows built in analyze_results
+METRIC_COLUMNS = [
+    'model', 'group_type', 'group_name', 'total_theorems', 'theorems_with_correct_proof',
+    'percentage_with_correct_proof', 'pass_at_1', 'pass_at_5', 'avg_compiled_ratio'
+]
 
-            ratio = compiled_lines_count / total_lines_count if total_lines_count > 0 else 0
-            sum_ratio += ratio
-            
-        avg_compiled_ratio = sum_ratio / total_count if total_count > 0 else 0
-        
-        metrics_data.append({
-            'model': model_name,
-            'group_type': 'brute_force',
-            'group_name': 'false',
-            'total_theorems': total_count,
-            'theorems_with_correct_proof': correct_count,
-            'percentage_with_correct_proof': (correct_count / total_count) * 100,
-            'pass_at_1': pass_at_1,
-            'pass_at_5': pass_at_5,
-            'avg_compiled_ratio': avg_compiled_ratio
-        })
-    
-    return metrics_data
+def open_metrics_writer(file_path, open_files):
+    """Open a metrics CSV for writing, write its header and remember the file so it can be closed later"""
+    f = open(file_path, 'w', newline='')
+    open_files.append(f)
+    writer = csv.DictWriter(f, fieldnames=METRIC_COLUMNS, lineterminator='\n')
+    writer.writeheader()
+    return writer
 
 def main():
     # Set the directory path where your JSONL files are located
@@ -261,56 +177,78 @@ def main():
     for model, results in model_results.items():
         print(f"  {model}: {len(results)} theorem results")
     
-    # Analyze results for each model
-    all_metrics_data = []
-    
-    for model_name, results in model_results.items():
-        print(f"\nComputing metrics for {model_name}...")
-        metrics_data = analyze_results(results, model_name)
-        all_metrics_data.extend(metrics_data)
-    
-    # Create DataFrame
-    df = pd.DataFrame(all_metrics_data)
-    
     # Save to CSV files
     output_dir = directory_path
     
-    # All metrics in one file (all models combined)
+    # Rows are written out as each model is analyzed; only the printed summary fields are kept in memory
     all_metrics_file = os.path.join(output_dir, "theorem_proving_metrics_all_models.csv")
-    df.to_csv(all_metrics_file, index=False)
-    print(f"\nAll metrics saved to: {all_metrics_file}")
+    group_files = {}
+    group_writers = {}
+    model_files = []
+    summary_rows = {}
+    open_files = []
     
-    # Separate files by group type (all models combined)
-    for group_type in df['group_type'].unique():
-        group_df = df[df['group_type'] == group_type]
-        group_file = os.path.join(output_dir, f"theorem_proving_metrics_{group_type}_all_models.csv")
-        group_df.to_csv(group_file, index=False)
-        print(f"{group_type} metrics (all models) saved to: {group_file}")
+    try:
+        # All metrics in one file (all models combined)
+        all_writer = open_metrics_writer(all_metrics_file, open_files)
+        
+        for model_name, results in model_results.items():
+            print(f"\nComputing metrics for {model_name}...")
+            metrics_data = analyze_results(results, model_name)
+            
+            # Separate files for each model, and by group type for each model
+            model_prefix = os.path.join(output_dir, f"theorem_proving_metrics_{model_name.replace('/', '_').replace('-', '_')}")
+            model_open_files = []
+            try:
+                model_writer = open_metrics_writer(f"{model_prefix}.csv", model_open_files)
+                model_group_writers = {}
+                
+                for row in metrics_data:
+                    group_type = row['group_type']
+                    
+                    # Separate files by group type (all models combined)
+                    if group_type not in group_writers:
+                        group_files[group_type] = os.path.join(output_dir, f"theorem_proving_metrics_{group_type}_all_models.csv")
+                        group_writers[group_type] = open_metrics_writer(group_files[group_type], open_files)
+                    if group_type not in model_group_writers:
+                        model_group_writers[group_type] = open_metrics_writer(f"{model_prefix}_{group_type}.csv", model_open_files)
+                    
+                    all_writer.writerow(row)
+                    group_writers[group_type].writerow(row)
+                    model_writer.writerow(row)
+                    model_group_writers[group_type].writerow(row)
+                    
+                    summary_rows.setdefault(model_name, []).append(
+                        {key: row[key] for key in METRIC_COLUMNS if key != 'avg_compiled_ratio'}
+                    )
+            finally:
+                for f in model_open_files:
+                    f.close()
+            model_files.append((model_name, f"{model_prefix}.csv"))
+            
+            # Push this model's rows in the combined files to disk before moving on
+            for f in open_files:
+                f.flush()
+    finally:
+        for f in open_files:
+            f.close()
     
-    # Separate files for each model
-    for model_name in df['model'].unique():
-        model_df = df[df['model'] == model_name]
-        model_file = os.path.join(output_dir, f"theorem_proving_metrics_{model_name.replace('/', '_').replace('-', '_')}.csv")
-        model_df.to_csv(model_file, index=False)
+    print(f"\nAll metrics saved to: {all_metrics_file}")
+    for group_type, group_file in group_files.items():
+        print(f"{group_type} metrics (all models) saved to: {group_file}")
+    for model_name, model_file in model_files:
         print(f"{model_name} metrics saved to: {model_file}")
-        
-        # Also create separate files by group type for each model
-        for group_type in model_df['group_type'].unique():
-            model_group_df = model_df[model_df['group_type'] == group_type]
-            model_group_file = os.path.join(output_dir, f"theorem_proving_metrics_{model_name.replace('/', '_').replace('-', '_')}_{group_type}.csv")
-            model_group_df.to_csv(model_group_file, index=False)
     
     # Print summary for each model
     print("\n" + "="*70)
     print("SUMMARY BY MODEL")
     print("="*70)
     
-    for model_name in sorted(df['model'].unique()):
-        model_df = df[df['model'] == model_name]
+    for model_name in sorted(summary_rows):
         print(f"\n{model_name.upper()}")
         print("-" * len(model_name))
         
-        for _, row in model_df.iterrows():
+        for row in summary_rows[model_name]:
             print(f"\n  {row['group_type'].upper()}: {row['group_name']}")
             print(f"    Total theorems: {row['total_theorems']}")
             print(f"    Theorems with correct proof: {row['theorems_with_correct_proof']} ({row['percentage_with_correct_proof']:.1f}%)")
@@ -321,10 +259,14 @@ def main():
     print("\n" + "="*70)
     print("MODEL COMPARISON - ALL STATEMENTS")
     print("="*70)
-    all_statements_df = df[df['group_type'] == 'all_statements'].sort_values('pass_at_1', ascending=False)
+    all_statements_rows = sorted(
+        (row for rows in summary_rows.values() for row in rows if row['group_type'] == 'all_statements'),
+        key=lambda row: row['pass_at_1'],
+        reverse=True
+    )
     print(f"{'Model':<25} {'Total':<8} {'Correct':<8} {'%Correct':<10} {'Pass@1':<8} {'Pass@5':<8}")
     print("-" * 70)
-    for _, row in all_statements_df.iterrows():
+    for row in all_statements_rows:
         print(f"{row['model']:<25} {row['total_theorems']:<8} {row['theorems_with_correct_proof']:<8} {row['percentage_with_correct_proof']:<10.1f} {row['pass_at_1']:<8.3f} {row['pass_at_5']:<8.3f}")
 
 
@@ -1,37 +1,93 @@
 import json
+import mmap
 import os
+import re
 from typing import Dict, List
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+# The line boundaries str.splitlines recognises, with '\r\n' counted as one
+LINE_BREAK_RE = re.compile('\r\n|[\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]')
+
+
+def leading_lines(text: str, count: int) -> List[str]:
+    """Return text.splitlines()[:count], scanning only as far as the lines it keeps."""
+    if count < 0:
+        return text.splitlines()[:count]
+    
+    lines = []
+    start = 0
+    for match in LINE_BREAK_RE.finditer(text):
+        if len(lines) == count:
+            return lines
+        lines.append(text[start:match.start()])
+        start = match.end()
+    if len(lines) < count and start < len(text):
+        lines.append(text[start:])
+    return lines
+
 
 def read_jsonl_file(filepath: str) -> Dict:
     data = {"experiment_setting": None, "results": []}
+    found_results = False
     
-    with open(filepath, 'r', encoding='utf-8') as f:
+    with open(filepath, 'rb', buffering=1 << 20) as f:
         for line in f:
-            line = line.strip()
-            if not line:
+            if line.isspace():
                 continue
-            parsed = json.loads(line)
+            parsed = _loads(line)
             if "experiment_setting" in parsed:
                 data["experiment_setting"] = parsed["experiment_setting"]
             elif "generation_results" in parsed:
                 data["results"] = parsed["generation_results"]
+                found_results = True
             elif "validation_results" in parsed:
                 data["results"] = parsed["validation_results"]
+                found_results = True
+            
+            # Both the setting and the results are in hand, so the rest of the file can be skipped
+            if data["experiment_setting"] is not None and found_results:
+                break
     return data
 
-def read_tasks(filepath: str) -> List[Dict]:
-    tasks = []
-    with open(filepath, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            tasks.append(json.loads(line))
-    return tasks
+class TaskIndex:
+    """Random access to the tasks of a JSONL file, parsing a line only when it is requested."""
+    
+    def __init__(self, filepath: str):
+        self.offsets = []
+        self.mm = None
+        with open(filepath, 'rb') as f:
+            # mmap cannot map an empty file
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        # Record where each non-blank line starts
+        pos = 0
+        for line in iter(self.mm.readline, b""):
+            if not line.isspace():
+                self.offsets.append(pos)
+            pos += len(line)
+    
+    def __len__(self) -> int:
+        return len(self.offsets)
+    
+    def __getitem__(self, idx: int) -> Dict:
+        start = self.offsets[idx]
+        end = self.mm.find(b"\n", start)
+        return _loads(self.mm[start:end if end != -1 else len(self.mm)])
+
+
+def read_tasks(filepath: str) -> TaskIndex:
+    return TaskIndex(filepath)
 
 
-def extract_unique_false_proofs(generation_data: Dict, validation_data: Dict, task_data: List[Dict]):
+def extract_unique_false_proofs(generation_data: Dict, validation_data: Dict, task_data: TaskIndex):
     generation_results = generation_data["results"]
     validation_results = validation_data["results"]
     
@@ -64,7 +120,8 @@ def extract_unique_false_proofs(generation_data: Dict, validation_data: Dict, ta
             raise ValueError(f"Mismatch in error_positions length for statement {statement_idx}: ")
         
         # Track unique proofs and their details
-        unique_false_attempts = {}  # proof_text -> (error_message, error_position)
+        unique_false_attempts = {}  # proof_text -> output record for its first occurrence
+        truncated = {}  # (candidate, error_end_line) -> false attempt, built once per distinct pair
         
         for i in range(expected_length):
             candidate = candidates[i]
@@ -75,22 +132,24 @@ def extract_unique_false_proofs(generation_data: Dict, validation_data: Dict, ta
             if is_correct or error_position is None:
                 continue
             
-            normalized_proof = candidate.replace('\r\n', '\n').replace('\r', '\n')
             error_end_pos = error_position['end_pos']
             error_end_line = error_end_pos[0] - num_statement_lines
             
-            false_attempt = '\n'.join(normalized_proof.splitlines()[:error_end_line + 1]).strip()
+            # Line breaking already covers '\r\n' and '\r', so no separate normalization pass is needed,
+            # and only the lines up to the error are ever split off
+            key = (candidate, error_end_line)
+            if key not in truncated:
+                truncated[key] = '\n'.join(leading_lines(candidate, error_end_line + 1)).strip()
+            false_attempt = truncated[key]
             
             if false_attempt not in unique_false_attempts:
-                unique_false_attempts[false_attempt] = (error_message, error_position)
+                unique_false_attempts[false_attempt] = {
+                    "proof": false_attempt,
+                    "error_message": error_message,
+                    "error_position": error_position
+                }
         
-        false_attempts = []
-        for false_attempt, (error_message, error_position) in unique_false_attempts.items():
-            false_attempts.append({
-                "proof": false_attempt,
-                "error_message": error_message,
-                "error_position": error_position
-            })
+        false_attempts = list(unique_false_attempts.values())
         
         output_data.append({
             "statement_idx": statement_idx,
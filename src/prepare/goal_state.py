@@ -18,12 +18,26 @@ def load_dataset(dataset_path: str):
     return tasks
 
 
-def get_goal_state(config, context_code, theorem_statement, timeout_per_proof=10):
+# Each pool worker keeps its own Lean server for every task it handles
+_server = None
+# Context environments already built on this worker's server, keyed by context code
+_env_cache = {}
+
+
+def _worker_init(config):
+    global _server
+    _server = LeanServer(config)
+
+
+def get_goal_state(server, context_code, theorem_statement, timeout_per_proof=10):
     
-    server = LeanServer(config)
-    context_res = server.run(Command(cmd=context_code))
-    assert not isinstance(context_res, LeanError)
-    context_env = context_res.env
+    # Tasks from the same source file share their context, so elaborate it only once
+    context_env = _env_cache.get(context_code)
+    if context_env is None:
+        context_res = server.run(Command(cmd=context_code))
+        assert not isinstance(context_res, LeanError)
+        context_env = context_res.env
+        _env_cache[context_code] = context_env
 
     lean_output = server.run(
         Command(cmd=theorem_statement + ":= sorry", env=context_env), timeout=timeout_per_proof
@@ -37,25 +51,31 @@ def get_goal_state(config, context_code, theorem_statement, timeout_per_proof=10
     return goal_state
 
 
-config = LeanREPLConfig(project=LocalProject("/Users/siyuange/Documents/lean_llm_test/miniF2F-lean4"))
-dataset_path = "/Users/siyuange/Documents/lean_llm_test/data/minif2f.jsonl"
-tasks = load_dataset(dataset_path)
-
-goal_states = []
-
-for i, task in tqdm(enumerate(tasks), total=len(tasks), desc="Getting goal states"):
-    context_code = task["srcContext"]
-    theorem_statement = task["theoremStatement"]
-    goal_state = get_goal_state(config, context_code, theorem_statement, timeout_per_proof=10)
-    goal_states.append({
+def _worker(indexed_task):
+    i, task = indexed_task
+    goal_state = get_goal_state(_server, task["srcContext"], task["theoremStatement"], timeout_per_proof=10)
+    return {
         "statement_idx": i,
         "goal_state": goal_state
-    })
-
-dataset_filename = os.path.basename(dataset_path)
-output_filename = f"{dataset_filename.rsplit('.', 1)[0]}_goal_states.jsonl"
-with open(output_filename, 'w', encoding='utf-8') as f:
-    for result in goal_states:
-        f.write(json.dumps(result, ensure_ascii=False) + "\n")
-print(f"Goal states saved to {output_filename}")
-    
\ No newline at end of file
+    }
+
+
+if __name__ == "__main__":
+    config = LeanREPLConfig(project=LocalProject("/Users/siyuange/Documents/lean_llm_test/miniF2F-lean4"))
+    dataset_path = "/Users/siyuange/Documents/lean_llm_test/data/minif2f.jsonl"
+    tasks = load_dataset(dataset_path)
+    
+    goal_states = []
+    
+    # Tasks are independent, so spread them over one Lean server per core
+    with Pool(mp.cpu_count(), initializer=_worker_init, initargs=(config,)) as pool:
+        for result in tqdm(pool.imap_unordered(_worker, enumerate(tasks)), total=len(tasks), desc="Getting goal states"):
+            goal_states.append(result)
+    goal_states.sort(key=lambda r: r["statement_idx"])
+    
+    dataset_filename = os.path.basename(dataset_path)
+    output_filename = f"{dataset_filename.rsplit('.', 1)[0]}_goal_states.jsonl"
+    with open(output_filename, 'w', encoding='utf-8') as f:
+        for result in goal_states:
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+    print(f"Goal states saved to {output_filename}")
@@ -1,4 +1,5 @@
 import json
+import re
 import asyncio
 import multiprocessing as mp
 from multiprocessing import Pool
@@ -9,7 +10,7 @@ from dotenv import load_dotenv
 from datetime import datetime
 from typing import List, Dict
 
-from tqdm import tqdm
+from tqdm.asyncio import tqdm as tqdm_asyncio
 import litellm
 from litellm import acompletion
 
@@ -38,6 +39,17 @@ nl_math_proof_prompt_template = """Natural Language Proof Idea Generation Task
 Based on the mathematical statement formalized in Lean 4 syntax, generate a short proof idea in natural language that outlines the main steps and concepts involved in proving the theorem. Use 2-3 sentences and ensure easy to implement with Lean 4.
 """
 
+nl_math_proof_batch_prompt_template = """Natural Language Proof Idea Generation Task
+
+### Formalized Statements:
+{theorem_statements}
+
+For each mathematical statement above, formalized in Lean 4 syntax, generate a short proof idea in natural language that outlines the main steps and concepts involved in proving the theorem. Use 2-3 sentences per statement and ensure easy to implement with Lean 4.
+Wrap the proof idea for statement i as <IDEA i=i>...</IDEA>, and answer every statement in order.
+"""
+
+IDEA_RE = re.compile(r'<IDEA i=(\d+)>(.*?)</IDEA>', re.DOTALL)
+
 
 def load_dataset(dataset_path: str):
     tasks = []
@@ -48,7 +60,7 @@ def load_dataset(dataset_path: str):
     return tasks
 
 
-def generate_proof_idea(theorem_statement: str, temperature: float = 0.3, max_tokens: int = 2048) -> str:
+async def generate_proof_idea(theorem_statement: str, temperature: float = 0.3, max_tokens: int = 2048) -> str:
     """
     Generate a natural language proof idea for a given Lean 4 theorem statement
     Args:
@@ -61,7 +73,7 @@ def generate_proof_idea(theorem_statement: str, temperature: float = 0.3, max_to
     try:
         user_prompt = nl_math_proof_prompt_template.format(theorem_statement=theorem_statement)
         
-        response = litellm.completion(
+        response = await acompletion(
             model="gemini/gemini-2.5-flash-preview-05-20",
             messages=[
                 {"role": "system", "content": nl_math_proof_system_prompt_template},
@@ -83,13 +95,52 @@ def generate_proof_idea(theorem_statement: str, temperature: float = 0.3, max_to
         raise Exception(f"Error generating proof idea: {str(e)}")
 
 
-def generate_proof_ideas(task_path: str, temperature: float = 0.3) -> List[Dict[str, str]]:
+async def generate_proof_idea_batch(theorem_statements: List[str], temperature: float = 0.3, max_tokens: int = 8192) -> List[str]:
+    """
+    Generate natural language proof ideas for several Lean 4 theorem statements in one request
+    Args:
+        theorem_statements: The Lean 4 formalized theorem statements
+        temperature: Control randomness in generation
+        
+    Returns:
+        Proof ideas in the order of the statements; None where the reply has no idea for a statement
+    """
+    try:
+        numbered = "\n".join(f"{i}) {statement}" for i, statement in enumerate(theorem_statements, 1))
+        user_prompt = nl_math_proof_batch_prompt_template.format(theorem_statements=numbered)
+        
+        response = await acompletion(
+            model="gemini/gemini-2.5-flash-preview-05-20",
+            messages=[
+                {"role": "system", "content": nl_math_proof_system_prompt_template},
+                {"role": "user", "content": user_prompt}
+            ],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            reasoning_effort="low",
+        )
+        
+        proof_ideas = [None] * len(theorem_statements)
+        for i, idea in IDEA_RE.findall(response.choices[0].message.content or ""):
+            i = int(i) - 1
+            if 0 <= i < len(proof_ideas) and idea.strip():
+                proof_ideas[i] = idea.strip()
+        
+        return proof_ideas
+        
+    except Exception as e:
+        raise Exception(f"Error generating proof ideas: {str(e)}")
+
+
+async def generate_proof_ideas(task_path: str, temperature: float = 0.3, concurrency: int = 32, batch_size: int = 1) -> List[Dict[str, str]]:
     """
     Generate proof ideas for multiple theorem statements
     
     Args:
         theorem_statements: List of Lean 4 formalized theorem statements
         temperature: Control randomness in generation
+        concurrency: Maximum number of requests in flight at once
+        batch_size: Number of statements sent together in one request
         
     Returns:
         List of dictionaries containing theorem statements and their proof ideas
@@ -100,26 +151,63 @@ def generate_proof_ideas(task_path: str, temperature: float = 0.3) -> List[Dict[
     
     tasks = load_dataset(task_path)
     
-    results = []
+    # Identical statements get a single request; first_idx is used to report errors
+    first_idx = {}
+    for i, task in enumerate(tasks):
+        first_idx.setdefault(task["theoremStatement"], i)
     
-    for i, task in tqdm(enumerate(tasks), total=len(tasks), desc="Generating proof ideas"):
-        statement = task["theoremStatement"]
-        try:
-            proof_idea = None
-            n_tries = 0
-            while n_tries < 5 and proof_idea is None:
-                proof_idea = generate_proof_idea(statement, temperature)
-                n_tries += 1
-            results.append({
-                "statement_idx": i,
-                "proof_idea": proof_idea
-            })
-        except Exception as e:
-            print(f"Error processing theorem {i}: {str(e)}")
-            results.append({
-                "statement_idx": i,
-                "proof_idea": None
-            })
+    sem = asyncio.Semaphore(concurrency)
+    
+    async def gen_one(i, statement):
+        async with sem:
+            try:
+                proof_idea = None
+                n_tries = 0
+                while n_tries < 5 and proof_idea is None:
+                    proof_idea = await generate_proof_idea(statement, temperature)
+                    n_tries += 1
+                return proof_idea
+            except Exception as e:
+                print(f"Error processing theorem {i}: {str(e)}")
+                return None
+    
+    async def gen_batch(batch):
+        async with sem:
+            try:
+                proof_ideas = await generate_proof_idea_batch([statement for statement, _ in batch], temperature)
+            except Exception as e:
+                print(f"Error processing theorems {batch[0][1]}-{batch[-1][1]}: {str(e)}")
+                proof_ideas = [None] * len(batch)
+        # Statements the batched reply did not answer fall back to individual requests
+        for j, (statement, i) in enumerate(batch):
+            if proof_ideas[j] is None:
+                proof_ideas[j] = await gen_one(i, statement)
+        return proof_ideas
+    
+    if batch_size > 1:
+        items = list(first_idx.items())
+        batches = [items[start:start + batch_size] for start in range(0, len(items), batch_size)]
+        batch_ideas = await tqdm_asyncio.gather(
+            *(gen_batch(batch) for batch in batches),
+            total=len(batches),
+            desc="Generating proof ideas"
+        )
+        proof_ideas = [idea for ideas in batch_ideas for idea in ideas]
+    else:
+        proof_ideas = await tqdm_asyncio.gather(
+            *(gen_one(i, statement) for statement, i in first_idx.items()),
+            total=len(first_idx),
+            desc="Generating proof ideas"
+        )
+    idea_by_statement = dict(zip(first_idx, proof_ideas))
+    
+    results = [
+        {
+            "statement_idx": i,
+            "proof_idea": idea_by_statement[task["theoremStatement"]]
+        }
+        for i, task in enumerate(tasks)
+    ]
     
     with open(output_filename, 'w', encoding='utf-8') as f:
         for result in results:
@@ -129,12 +217,13 @@ def generate_proof_ideas(task_path: str, temperature: float = 0.3) -> List[Dict[
     return results
 
 
-def generate_proof_ideas_for_null(current_proof_idea_path, dataset_path, temperature = 0.3, max_tokens = 4096):
+async def generate_proof_ideas_for_null(current_proof_idea_path, dataset_path, temperature = 0.3, max_tokens = 4096, concurrency = 32):
     """
     Generate proof ideas for theorem statements that currently have null proof ideas
     Args:
         current_proof_ideas: List of dictionaries containing theorem statements and their current proof ideas
         temperature: Control randomness in generation
+        concurrency: Maximum number of requests in flight at once
     """
     
     tasks = load_dataset(dataset_path)
@@ -146,17 +235,38 @@ def generate_proof_ideas_for_null(current_proof_idea_path, dataset_path, tempera
             item = json.loads(line)
             current_proof_ideas.append(item)
     
-    for task, item in tqdm(zip(tasks, current_proof_ideas)):
+    # Reuse ideas already generated for an identical statement, and request each missing statement only once
+    known = {}
+    pending = {}
+    for task, item in zip(tasks, current_proof_ideas):
+        statement = task["theoremStatement"]
+        if item["proof_idea"] is not None:
+            known.setdefault(statement, item["proof_idea"])
+        else:
+            pending.setdefault(statement, []).append(item)
+    
+    sem = asyncio.Semaphore(concurrency)
+    
+    async def fill_one(statement, items):
+        proof_idea = known.get(statement)
         n_tries = 0
-        while item["proof_idea"] is None and n_tries < 3:
-            try:
-                new_proof_idea = generate_proof_idea(task["theoremStatement"], temperature, max_tokens)
-                assert new_proof_idea is not None, "Generated proof idea is None"
-                item["proof_idea"] = new_proof_idea
-            except Exception as e:
-                print(f"Error generating proof idea for theorem {item['statement_idx']}: {str(e)}")
-                item["proof_idea"] = None
+        while proof_idea is None and n_tries < 3:
+            async with sem:
+                try:
+                    proof_idea = await generate_proof_idea(statement, temperature, max_tokens)
+                    assert proof_idea is not None, "Generated proof idea is None"
+                except Exception as e:
+                    print(f"Error generating proof idea for theorem {items[0]['statement_idx']}: {str(e)}")
+                    proof_idea = None
             n_tries += 1
+            # Back off before retrying so rate-limit errors have time to clear; the semaphore is
+            # released meanwhile so other statements can proceed, and there is no wait after the last try
+            if proof_idea is None and n_tries < 3:
+                await asyncio.sleep(2 ** (n_tries - 1))
+        for item in items:
+            item["proof_idea"] = proof_idea
+    
+    await tqdm_asyncio.gather(*(fill_one(statement, items) for statement, items in pending.items()), total=len(pending))
     
     with open(current_proof_idea_path, 'w', encoding='utf-8') as f:
         for item in current_proof_ideas:
@@ -166,12 +276,12 @@ def generate_proof_ideas_for_null(current_proof_idea_path, dataset_path, tempera
     
     
 dataset_path = "/Users/siyuange/Documents/lean_llm_test/data/minif2f/minif2f.jsonl"
-# generate_proof_ideas(dataset_path, temperature=0.3)
+# asyncio.run(generate_proof_ideas(dataset_path, temperature=0.3))
 
-generate_proof_ideas_for_null(
+asyncio.run(generate_proof_ideas_for_null(
     "/Users/siyuange/Documents/lean_llm_test/data/minif2f/minif2f_proof_ideas.jsonl",
     dataset_path,
     temperature=0.1,
     max_tokens=3000
-)
+))
 
@@ -1,158 +1,192 @@
-import json
 import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 from lean_interact import *
-from lean_interact.interface import LeanError
 from tqdm import tqdm
 
-def load_dataset(dataset_path: str):
-    tasks = []
-    with open(dataset_path) as f:
-        for line in f.readlines():
-            task = json.loads(line)
-            tasks.append(task)
-    return tasks
+from json_io import dumps_json, load_generation, load_jsonl, loads_json, read_partial, write_partial
+from lean_check import check_context_proofs, restart_server, worker_init
 
 
-def load_generation(generation_path: str):
-    with open(generation_path) as f:
-        lines = f.readlines()
-        settings = json.loads(lines[0])["experiment_setting"]
-        generations = json.loads(lines[1])["generation_results"]
-    return settings, generations
-      
-
-def check_context_proofs(args: tuple[int, LeanREPLConfig, int, str, str, list[str]]):
+def revalidate_task(job: tuple[int, int, str, str, list[str]]):
     """
-    Check the correctness of the given proofs for a given context and declaration to prove.
+    Re-check the candidates of one theorem, retrying when Lean fails to answer.
+    The candidates re-checked are mostly ones that timed out before, so each gets its own command and time limit.
     """
-    idx, repl_config, timeout_per_proof, context_code, theorem_statement, proofs = args
-
-    server = LeanServer(repl_config)
-    context_res = server.run(Command(cmd=context_code))
-    assert not isinstance(context_res, LeanError)
-    context_env = context_res.env
-
-    correctness = []
-    error_messages = []
-    error_positions = []
-    compiled_line_counts = []
+    idx = job[0]
+    n_tries = 0
     
-    for proof in proofs:
+    correctness = None
+    error_positions = None
+    error_messages = None
+    compiled_line_counts = None
+    
+    while correctness is None and n_tries < 5:
         try:
-            lean_output = server.run(
-                Command(cmd=theorem_statement + " := " + proof, env=context_env), timeout=timeout_per_proof
-            )
-            if not isinstance(lean_output, LeanError) and lean_output.lean_code_is_valid(allow_sorry=False):
-                correctness.append(True)
-                error_messages.append(None)
-                error_positions.append(None)
-                compiled_line_counts.append(len(proof.splitlines()))
-            elif isinstance(lean_output, LeanError):
-                correctness.append(False)
-                error_messages.append(lean_output.message)
-                error_positions.append(None)
-                compiled_line_counts.append(None)
-            else:
-                correctness.append(False)
-                messages = lean_output.messages
-                message = messages[0]
-                error_messages.append(message.data)
-                error_positions.append({
-                    'start_pos': (message.start_pos.line, message.start_pos.column),
-                    'end_pos': (message.end_pos.line, message.end_pos.column)
-                } if message.start_pos and message.end_pos else None)
-                compiled_line_counts.append(message.start_pos.line - len(theorem_statement.splitlines()) if message.start_pos else None)
-                
-        except (TimeoutError, ConnectionAbortedError, json.JSONDecodeError):
-            correctness.append(None)
-            error_positions.append(None)
-            error_messages.append(None)
-            compiled_line_counts.append(None)
-
-    return idx, correctness, error_positions, error_messages, compiled_line_counts
-
-
-
-config = LeanREPLConfig(project=LocalProject("/Users/siyuange/Documents/lean_llm_test/miniF2F-lean4"))
-dataset_path = "/Users/siyuange/Documents/lean_llm_test/data/minif2f/minif2f.jsonl"
-
-dir_path = "/Users/siyuange/Documents/lean_llm_test/results/minif2f/proof_idea"
-
-generation_paths = []
-
-for filename in os.listdir(dir_path):
-    if filename.endswith("_generation.jsonl"):
-        generation_paths.append(os.path.join(dir_path, filename))
-
-for generation_path in generation_paths:
+            idx, correctness, error_positions, error_messages, compiled_line_counts = check_context_proofs(job, batch=False)
+        except Exception as e:
+            print(f"Error processing theorem {idx}: {str(e)}")
+            # The next attempt starts from a fresh server, as it would have before servers were reused
+            restart_server()
+        n_tries += 1
+
+    return {
+        "statement_idx": idx,
+        "correctness": correctness,
+        "error_positions": error_positions,
+        "error_messages": error_messages,
+        "compiled_line_counts": compiled_line_counts,
+    }
+
+
+def revalidate_file(executor: ProcessPoolExecutor, generation_path: str, tasks: list[dict]) -> bool:
+    """
+    Re-check the unanswered candidates of one generation file and write its validation file back.
+    Returns whether every candidate now has a verdict.
+    """
     validation_path = generation_path.replace("generation", "validation")
-    tasks = load_dataset(dataset_path)
-    settings, generations = load_generation(generation_path)
+    # The setting written back is the validation file's own, read below
+    _, generations = load_generation(generation_path)
 
     print(f"Loaded generations from {generation_path}.")
 
-    with open(validation_path) as f:
-        lines = f.readlines()
-        settings = json.loads(lines[0])["experiment_setting"]
-        validations = json.loads(lines[1])["validation_results"]
+    with open(validation_path, 'rb') as f:
+        settings = loads_json(f.readline())["experiment_setting"]
+        validations = loads_json(f.readline())["validation_results"]
 
-    revalidate = []
+    # statement_idx -> indices of the candidates that still need a verdict
+    revalidate = {}
 
     for i, result in enumerate(validations):
         expected_len = 6
+        all_candidates = list(range(len(generations[i]["candidates"])))
         if result["error_messages"] is None or result["error_positions"] is None or result["correctness"] is None:
-            revalidate.append(i)
+            revalidate[i] = all_candidates
+            continue
+        if result.get("compiled_line_counts") is None:
+            revalidate[i] = all_candidates
             continue
         if (len(result["error_messages"]) != expected_len):
-            revalidate.append(i)
+            revalidate[i] = all_candidates
             continue
         if(len(result["error_positions"]) != expected_len):
-            revalidate.append(i)
+            revalidate[i] = all_candidates
             continue
         if(len(result["correctness"]) != expected_len):
-            revalidate.append(i)
+            revalidate[i] = all_candidates
             continue
-        if any(correct is None for correct in result["correctness"]):
-            revalidate.append(i)
+        if(len(result["compiled_line_counts"]) != expected_len):
+            revalidate[i] = all_candidates
             continue
-
-
-    for idx in tqdm(revalidate):
-      
-        task = tasks[idx]
-        generation = generations[idx]
-
-        context_code = task["srcContext"]
-        theorem_statement = task["theoremStatement"]
-        proofs = generation["candidates"]
-
-        n_tries = 0
+        # Candidates with a True or False verdict are settled; only the ones Lean never answered are re-run
+        missing = [j for j, correct in enumerate(result["correctness"]) if correct is None]
+        if missing:
+            revalidate[i] = missing
+
+
+    # Re-checked theorems are streamed to the .partial file, so an interrupted run resumes where it stopped
+    partial_path = validation_path + ".partial"
+    resumed = read_partial(partial_path)
+    for validation_result in resumed:
+        validations[validation_result["statement_idx"]] = validation_result
+        revalidate.pop(validation_result["statement_idx"], None)
+    if resumed:
+        print(f"Resuming from {partial_path}: {len(resumed)} theorems already revalidated")
+    write_partial(partial_path, settings, resumed)
+
+    # Submit theorems grouped by context and, within a context, the most proof text first,
+    # so a long theorem does not start last and hold up the tail of the run
+    pending = sorted(revalidate, key=lambda idx: (
+        hash(tasks[idx]["srcContext"]), -sum(len(generations[idx]["candidates"][j]) for j in revalidate[idx])
+    ))
+
+    # Re-check the theorems in parallel on the shared workers
+    with open(partial_path, "ab", buffering=0) as partial_file:
+        futures = [
+            executor.submit(
+                revalidate_task,
+                (idx, 90, tasks[idx]["srcContext"], tasks[idx]["theoremStatement"], [generations[idx]["candidates"][j] for j in revalidate[idx]])
+            )
+            for idx in pending
+        ]
+        for future in tqdm(as_completed(futures), total=len(futures), mininterval=1.0, smoothing=0.05):
+            validation_result = future.result()
+            idx = validation_result["statement_idx"]
+            missing = revalidate[idx]
         
-        correctness = None
-        error_positions = None
-        error_messages = None
-        compiled_line_counts = None
+            if len(missing) == len(generations[idx]["candidates"]):
+                validations[idx] = validation_result
+            elif validation_result["correctness"] is not None:
+                # Merge the fresh verdicts into the candidates' slots, keeping the settled ones as they were
+                result = validations[idx]
+                for key in ("correctness", "error_positions", "error_messages", "compiled_line_counts"):
+                    merged = list(result[key])
+                    for k, j in enumerate(missing):
+                        merged[j] = validation_result[key][k]
+                    result[key] = merged
         
-        while correctness is None and n_tries < 5:
+            partial_file.write(dumps_json(validations[idx]) + b'\n')
+    
+    with open(validation_path, "wb") as f:
+        f.write(dumps_json({"experiment_setting": settings}) + b'\n')
+        f.write(dumps_json({"validation_results": validations}) + b'\n')
+    os.remove(partial_path)
+
+    return all(
+        result["correctness"] is not None and None not in result["correctness"]
+        for result in validations
+    )
+
+
+if __name__ == "__main__":
+    config = LeanREPLConfig(project=LocalProject("/Users/siyuange/Documents/lean_llm_test/miniF2F-lean4"))
+    dataset_path = "/Users/siyuange/Documents/lean_llm_test/data/minif2f/minif2f.jsonl"
+
+    # Verdicts are remembered across files and runs; delete it after changing the Lean project or Mathlib version
+    memo_path = "cache/lean_results.sqlite"
+
+    dir_path = "/Users/siyuange/Documents/lean_llm_test/results/minif2f/proof_idea"
+
+    # Largest files first, so the biggest job is not the one left running at the end
+    with os.scandir(dir_path) as entries:
+        generation_entries = [entry for entry in entries if entry.name.endswith("_generation.jsonl")]
+    generation_entries.sort(key=lambda entry: entry.stat().st_size, reverse=True)
+    generation_paths = [entry.path for entry in generation_entries]
+
+    # Every generation file refers to the same dataset, so load it once
+    tasks = load_jsonl(dataset_path)
+
+    common_contexts = [context_code for context_code, _ in Counter(task["srcContext"] for task in tasks).most_common(3)]
+
+    # One pool for all generation files: the workers' Lean servers and context environments stay warm from file to file
+    with ProcessPoolExecutor(max_workers=os.cpu_count(), initializer=worker_init, initargs=(config, common_contexts, memo_path)) as executor:
+        for generation_path in generation_paths:
+            # Several runs, possibly on machines sharing this directory, split the files between them:
+            # a run only takes a file whose .lock it managed to create, and .done marks finished files
+            done_path = generation_path + ".done"
+            lock_path = generation_path + ".lock"
+            if os.path.exists(done_path):
+                continue
             try:
-                idx, correctness, error_positions, error_messages, compiled_line_counts = check_context_proofs(
-                    (idx, config, 90, context_code, theorem_statement, proofs)
-                )
-            except Exception as e:
-                print(f"Error processing theorem {idx}: {str(e)}")
-            n_tries += 1
-
-        validation_result = {
-            "statement_idx": idx,
-            "correctness": correctness,
-            "error_positions": error_positions,
-            "error_messages": error_messages,
-            "compiled_line_counts": compiled_line_counts,
-        }
-
-        validations[idx] = validation_result
-        
-    with open(validation_path, "w") as f:
-        f.write(json.dumps({"experiment_setting": settings}) + '\n')
-        f.write(json.dumps({"validation_results": validations}) + '\n')
\ No newline at end of file
+                os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            except FileExistsError:
+                try:
+                    lock_age = f"{(time.time() - os.path.getmtime(lock_path)) / 60:.0f} min old"
+                except FileNotFoundError:
+                    lock_age = "just released"
+                print(f"Skipping {generation_path}: claimed by another run ({lock_path}, {lock_age}). "
+                      f"If no other run is active, the lock was left by a killed run; delete it to retry.")
+                continue
+
+            try:
+                # Another run may have finished the file between the check above and taking the lock;
+                # a file with candidates Lean still did not answer is left open for the next run
+                if not os.path.exists(done_path):
+                    if revalidate_file(executor, generation_path, tasks):
+                        open(done_path, "wb").close()
+                    else:
+                        print(f"{generation_path} still has unanswered candidates; not marking it done.")
+            finally:
+                os.unlink(lock_path)
@@ -1,113 +1,36 @@
-import json
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 from lean_interact import *
-from lean_interact.interface import LeanError
 from tqdm import tqdm
 
+from json_io import dumps_json, load_generation, load_jsonl, read_partial, write_partial
+from lean_check import check_context_proofs, restart_server, worker_init
 
-def load_dataset(dataset_path: str):
-    tasks = []
-    with open(dataset_path) as f:
-        for line in f.readlines():
-            task = json.loads(line)
-            tasks.append(task)
-    return tasks
 
+# Result of a theorem Lean never answered for, copied for each theorem before its first try
+_UNVALIDATED = {
+    "statement_idx": None,
+    "correctness": None,
+    "error_positions": None,
+    "error_messages": None,
+    "compiled_line_counts": None
+}
 
-def load_generation(generation_path: str):
-    with open(generation_path) as f:
-        lines = f.readlines()
-        settings = json.loads(lines[0])["experiment_setting"]
-        generations = json.loads(lines[1])["generation_results"]
-    return settings, generations
-      
 
-def check_context_proofs(args: tuple[int, LeanREPLConfig, int, str, str, list[str]]):
+def validate_task(job: tuple[int, int, str, str, list[str]], early_exit: bool = False, adaptive_timeout: bool = False):
     """
-    Check the correctness of the given proofs for a given context and declaration to prove.
+    Validate the candidates of one theorem, retrying when Lean fails to answer.
+    With early_exit, candidates after the first correct proof are left unchecked (None).
+    With adaptive_timeout, proofs first get a quarter of the timeout and only the ones that ran out get the rest.
     """
-    idx, repl_config, timeout_per_proof, context_code, theorem_statement, proofs = args
-
-    server = LeanServer(repl_config)
-    context_res = server.run(Command(cmd=context_code))
-    assert not isinstance(context_res, LeanError)
-    context_env = context_res.env
-
-    correctness = []
-    error_messages = []
-    error_positions = []
-    compiled_line_counts = []
-    
-    for proof in proofs:
-        try:
-            lean_output = server.run(
-                Command(cmd=theorem_statement + " := " + proof, env=context_env), timeout=timeout_per_proof
-            )
-            if not isinstance(lean_output, LeanError) and lean_output.lean_code_is_valid(allow_sorry=False):
-                correctness.append(True)
-                error_messages.append(None)
-                error_positions.append(None)
-                compiled_line_counts.append(len(proof.splitlines()))
-            elif isinstance(lean_output, LeanError):
-                correctness.append(False)
-                error_messages.append(lean_output.message)
-                error_positions.append(None)
-                compiled_line_counts.append(None)
-            else:
-                correctness.append(False)
-                messages = lean_output.messages
-                message = messages[0]
-                error_messages.append(message.data)
-                error_positions.append({
-                    'start_pos': (message.start_pos.line, message.start_pos.column),
-                    'end_pos': (message.end_pos.line, message.end_pos.column)
-                } if message.start_pos and message.end_pos else None)
-                compiled_line_counts.append(message.start_pos.line - len(theorem_statement.splitlines()) if message.start_pos else None)
-                
-        except (TimeoutError, ConnectionAbortedError, json.JSONDecodeError):
-            correctness.append(None)
-            error_positions.append(None)
-            error_messages.append(None)
-            compiled_line_counts.append(None)
-
-    return idx, correctness, error_positions, error_messages, compiled_line_counts
-
-
-config = LeanREPLConfig(project=LocalProject("/Users/siyuange/Documents/lean_llm_test/miniF2F-lean4"))
-dataset_path = "/Users/siyuange/Documents/lean_llm_test/data/minif2f/minif2f.jsonl"
-generation_path = "/Users/siyuange/Documents/lean_llm_test/results/minif2f/false_attempts/experiment_results_claude-sonnet-4-20250514_wo_20250620_121319_generation.jsonl"
-# validation_path = generation_path.replace("generation", "validation")
-
-
-tasks = load_dataset(dataset_path)
-settings, generations = load_generation(generation_path)
-assert len(tasks) == len(generations), "Number of tasks and generations do not match."
-
-validation_results = []
-
-for idx in tqdm(range(len(tasks)), total=len(tasks)):
-    task = tasks[idx]
-    generation = generations[idx]
-    
-    context_code = task["srcContext"]
-    theorem_statement = task["theoremStatement"]
-    proofs = generation["candidates"]
-
-    validation_result = {
-        "statement_idx": idx,
-        "correctness": None,
-        "error_positions": None,
-        "error_messages": None,
-        "compiled_line_counts": None
-    }
+    idx = job[0]
+    validation_result = dict(_UNVALIDATED, statement_idx=idx)
     
     n_tries = 0
     while validation_result["correctness"] is None and n_tries < 3:
         try:
-            idx, correctness, error_positions, error_messages, compiled_line_counts = check_context_proofs(
-                (idx, config, 10, context_code, theorem_statement, proofs)
-            )
+            idx, correctness, error_positions, error_messages, compiled_line_counts = check_context_proofs(job, early_exit=early_exit, adaptive_timeout=adaptive_timeout)
 
             validation_result = {
                 "statement_idx": idx,
@@ -118,18 +41,69 @@ for idx in tqdm(range(len(tasks)), total=len(tasks)):
             }
         except Exception as e:
             print(f"Error processing theorem {idx}: {str(e)}")
+            # The next attempt starts from a fresh server, as it would have before servers were reused
+            restart_server()
         n_tries += 1
     
-    validation_results.append(validation_result)
-
-
-experiment_name = os.path.basename(generation_path).split('_generation', 1)[0]
-output_filename = f"{experiment_name}_validation.jsonl"
-
-with open(output_filename, "w") as f:
-    f.write(json.dumps({"experiment_setting": settings}) + '\n')
-    f.write(json.dumps({"validation_results": validation_results}) + '\n')
-
-
-
-
+    return validation_result
+
+
+if __name__ == "__main__":
+    config = LeanREPLConfig(project=LocalProject("/Users/siyuange/Documents/lean_llm_test/miniF2F-lean4"))
+    dataset_path = "/Users/siyuange/Documents/lean_llm_test/data/minif2f/minif2f.jsonl"
+    generation_path = "/Users/siyuange/Documents/lean_llm_test/results/minif2f/false_attempts/experiment_results_claude-sonnet-4-20250514_wo_20250620_121319_generation.jsonl"
+    # Verdicts are remembered across runs; delete it after changing the Lean project or Mathlib version
+    memo_path = "cache/lean_results.sqlite"
+    # Stop at the first correct proof of each theorem, when one working proof is all that is needed
+    early_exit = False
+    # Give each proof a quarter of the timeout first; pays off only when few proofs are slow,
+    # since each one that runs out restarts its worker's Lean server
+    adaptive_timeout = False
+    # validation_path = generation_path.replace("generation", "validation")
+
+
+    tasks = load_jsonl(dataset_path)
+    settings, generations = load_generation(generation_path)
+    assert len(tasks) == len(generations), "Number of tasks and generations do not match."
+
+    experiment_name = os.path.basename(generation_path).split('_generation', 1)[0]
+    output_filename = f"{experiment_name}_validation.jsonl"
+    partial_filename = output_filename + ".partial"
+
+    validation_results = [None] * len(tasks)
+
+    # Results are streamed to the .partial file as they complete, so an interrupted run loses no Lean work
+    resumed = read_partial(partial_filename)
+    for validation_result in resumed:
+        validation_results[validation_result["statement_idx"]] = validation_result
+    if resumed:
+        print(f"Resuming from {partial_filename}: {len(resumed)} theorems already validated")
+    write_partial(partial_filename, settings, resumed)
+
+    # Submit theorems grouped by context and, within a context, the most proof text first,
+    # so a long theorem does not start last and hold up the tail of the run
+    pending = [idx for idx in range(len(tasks)) if validation_results[idx] is None]
+    pending.sort(key=lambda idx: (hash(tasks[idx]["srcContext"]), -sum(map(len, generations[idx]["candidates"]))))
+
+    # Theorems are independent and Lean-bound, so spread them over one long-lived Lean server per core
+    with open(partial_filename, "ab", buffering=0) as partial_file, \
+            ProcessPoolExecutor(max_workers=os.cpu_count(), initializer=worker_init, initargs=(config, (), memo_path)) as executor:
+        futures = [
+            executor.submit(
+                validate_task,
+                (idx, 10, tasks[idx]["srcContext"], tasks[idx]["theoremStatement"], generations[idx]["candidates"]),
+                early_exit,
+                adaptive_timeout
+            )
+            for idx in pending
+        ]
+        for future in tqdm(as_completed(futures), total=len(futures), mininterval=1.0, smoothing=0.05):
+            validation_result = future.result()
+            validation_results[validation_result["statement_idx"]] = validation_result
+            partial_file.write(dumps_json(validation_result) + b'\n')
+
+
+    with open(output_filename, "wb") as f:
+        f.write(dumps_json({"experiment_setting": settings}) + b'\n')
+        f.write(dumps_json({"validation_results": validation_results}) + b'\n')
+    os.remove(partial_filename)